@@ -1,12 +1,18 @@
 import cv2
 import tkinter as tk
-from PIL import Image, ImageTk
 import os
 import datetime
 import subprocess
 import platform
 import threading
-import queue
+from capture import CaptureThread, CaptureWatchdog, FrameBus, FrameStats
+from frame_source import open_source
+from display import GeometryTracker, ZoomView, bind_zoom_controls, open_display_surface, scaling_plan
+from overlay import TextCache, overlay_colours, text_size
+from pacing import TkFramePacer
+
+# Same colours as the Tk app's overlay
+OVERLAY_COLOURS = overlay_colours("BGR")
 
 class CameraApp:
     def __init__(self, window, window_title):
@@ -21,10 +27,6 @@ class CameraApp:
         self.paused = False
         self.recording_start_time = None
         self.paused_duration = datetime.timedelta()
-        self.recording_timer_label = None
-
-        # Thread-safe queue for frames
-        self.frame_queue = queue.Queue()
 
         # Bind the Esc key to the close function
         self.window.bind('<Escape>', lambda e: self.close_app())
@@ -37,64 +39,93 @@ class CameraApp:
         self.window.bind('v', lambda e: self.toggle_recording())
         self.window.bind('V', lambda e: self.toggle_recording())
         self.window.bind('<space>', lambda e: self.pause_or_resume_recording())
+        self.window.bind('z', lambda e: self.toggle_record_view())
+        self.window.bind('Z', lambda e: self.toggle_record_view())
+
+        # The date overlay is rasterised once per string and blitted, shared by the preview and recorder
+        self.text_cache = TextCache()
+
+        # Digital zoom and pan, the recorder keeps the full frame unless switched with Z
+        self.zoom = ZoomView()
+        self.record_zoomed = False
 
         # Get screen width and height
         self.screen_width = self.window.winfo_screenwidth()
         self.screen_height = self.window.winfo_screenheight()
 
-        # Open the default webcam
-        self.video_source = 0
-        self.vid = cv2.VideoCapture(self.video_source)
+        # Open the default webcam, or the source named in AERICAM_SOURCE
+        self.video_source = None
+        self.vid = open_source(self.video_source)
 
         # Get the width and height of the video source
         self.cam_width = int(self.vid.get(cv2.CAP_PROP_FRAME_WIDTH))
         self.cam_height = int(self.vid.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.cam_fps = self.vid.get(cv2.CAP_PROP_FPS) or 20.0
+
+        # Single reader on the camera, frames are fanned out to the preview, recorder and stills
+        self.bus = FrameBus()
+        self.preview_frames = self.bus.subscribe(maxsize=1, drop="oldest")
+        self.still_frames = self.bus.subscribe(maxsize=1, drop="oldest")
+        self.record_frames = None
+        self.frame_stats = FrameStats()
+        self.grabber = CaptureThread(self.vid, bus=self.bus).start()
+        # Camera dropouts are bridged with placeholder frames instead of closing the app
+        self.watchdog = CaptureWatchdog(self.grabber, placeholder_size=(self.cam_width or 1280, self.cam_height or 720)).start()
 
         # Create a canvas that fits the screen size
         self.canvas = tk.Canvas(window, width=self.screen_width, height=self.screen_height)
         self.canvas.pack()
 
+        # Long-lived canvas items, updated in place every frame instead of recreated
+        self.display_surface = open_display_surface()
+        self.geometry = GeometryTracker(self.canvas, initial=(self.screen_width, self.screen_height))
+        self.image_item = self.canvas.create_image(0, 0, anchor=tk.NW)
+        self.image_position = (0, 0)
+        bind_zoom_controls(self.window, self.canvas, self.zoom, self.image_rect)
+        self.timer_background = self.canvas.create_rectangle(0, 0, 0, 0, fill="black", outline="", state=tk.HIDDEN)
+        self.timer_item = self.canvas.create_text(self.screen_width // 2, 20, text="00:00:00", fill="red",
+                                                  font=("Arial", 20), anchor="n", state=tk.HIDDEN)
+
         # Button to close the application
         self.btn_close = tk.Button(window, text="Close", command=self.close_app)
         self.btn_close.pack(side=tk.BOTTOM, anchor=tk.S)
 
-        self.delay = 15  # Delay for frame update
-        self.update()  # Call the update method to display the video feed
+        # Display the video feed, paced to the camera's frame interval
+        self.pacer = TkFramePacer(self.window, self.update, self.cam_fps).start()
 
         self.window.mainloop()
 
     def update(self):
-        ret, frame = self.vid.read()
-        if ret:
-            # Clear the canvas before drawing a new frame
-            self.canvas.delete("all")
+        # Returns True when a new frame was drawn
+        captured = self.preview_frames.get_nowait()
+        if captured is not None:
+            self.frame_stats.update(captured)
 
-            # Preserve aspect ratio of the camera feed
-            aspect_ratio = self.cam_width / self.cam_height
-            new_width, new_height = self.screen_width, self.screen_height
+            # Crop to the zoomed region first (a view, no copy) so the resize reads only those pixels
+            view = self.zoom.crop(captured.image)
 
-            if self.screen_width / self.screen_height > aspect_ratio:
-                new_width = int(self.screen_height * aspect_ratio)
-            else:
-                new_height = int(self.screen_width / aspect_ratio)
+            # Preserve aspect ratio of the camera feed, the letterbox plan is only rebuilt when a size changes
+            source_size = (view.shape[1], view.shape[0])
+            plan = scaling_plan(source_size, self.geometry.current(), letterbox=True)
+            new_width, new_height = plan.size
 
             # Resize the frame while maintaining aspect ratio
-            frame = cv2.resize(frame, (new_width, new_height))
+            if plan.skip:
+                frame = view.copy()
+            else:
+                frame = cv2.resize(view, plan.size, interpolation=plan.interpolation)
 
             # Add date and time overlay to the frame
-            self.add_date_time_overlay(frame, new_width, new_height)
+            self.add_date_time_overlay(frame, new_width, new_height, captured.wall_time)
 
-            # Convert the frame to RGB format for displaying
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            self.photo = ImageTk.PhotoImage(image=Image.fromarray(frame))
+            # The display surface converts to RGB, everything else stays in BGR
+            if self.display_surface.update(frame):
+                self.canvas.itemconfig(self.image_item, image=self.display_surface.photo)
 
             # Center the image on the canvas
-            self.canvas.create_image(
-                (self.screen_width - new_width) // 2,
-                (self.screen_height - new_height) // 2,
-                image=self.photo,
-                anchor=tk.NW
-            )
+            if plan.offset != self.image_position:
+                self.canvas.coords(self.image_item, *plan.offset)
+                self.image_position = plan.offset
 
             # Store the frame for saving when "P" is pressed
             self.current_frame = frame
@@ -102,35 +133,39 @@ class CameraApp:
         if self.recording:
             self.update_timer()
 
-        # Check for video capture failure
-        if not ret:
-            print("Failed to grab frame. Exiting...")
-            self.close_app()
-            return
+        return captured is not None
+
+    def image_rect(self):
+        if self.display_surface.size is None:
+            return None
+        return self.image_position + self.display_surface.size
 
-        self.window.after(self.delay, self.update)
+    def toggle_record_view(self):
+        self.record_zoomed = not self.record_zoomed
+        print(f"Recording the {'zoomed view' if self.record_zoomed else 'full frame'}.")
 
-    def add_date_time_overlay(self, frame, new_width, new_height):
-        current_time = datetime.datetime.now().strftime("%d/%m/%Y - %H:%M:%S")
+    def add_date_time_overlay(self, frame, new_width, new_height, now):
+        current_time = now.strftime("%d/%m/%Y - %H:%M:%S")
         font_scale = new_height / 720
-        text_size = cv2.getTextSize(current_time, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 2)[0]
-        text_x = new_width - text_size[0] - 10
+        text_width = text_size(current_time, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 2)[0][0]
+        text_x = new_width - text_width - 10
         text_y = new_height - 10
-        cv2.putText(frame, current_time, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), 2, cv2.LINE_AA)
+        self.text_cache.put_text(frame, current_time, (text_x, text_y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, OVERLAY_COLOURS["date_text"], 2, cv2.LINE_AA)
 
     def toggle_recording(self):
         if self.recording:
             self.recording = False
-            if self.recording_timer_label:
-                self.recording_timer_label.place_forget()
+            self.canvas.itemconfig(self.timer_item, state=tk.HIDDEN)
+            self.canvas.itemconfig(self.timer_background, state=tk.HIDDEN)
             self.stop_video_recording()
         else:
             self.recording = True
             self.paused = False
             self.recording_start_time = datetime.datetime.now()
             self.paused_duration = datetime.timedelta()
-            self.recording_timer_label = tk.Label(self.window, text="00:00:00", fg="red", font=("Arial", 20), bg="black")
-            self.recording_timer_label.place(x=self.screen_width // 2, y=20, anchor="n")
+            self.canvas.itemconfig(self.timer_background, state=tk.NORMAL)
+            self.canvas.itemconfig(self.timer_item, state=tk.NORMAL)
+            self.set_timer_text("00:00:00", force=True)
             self.start_video_recording()
 
     def pause_or_resume_recording(self):
@@ -149,54 +184,78 @@ class CameraApp:
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         self.video_filename = f"Gallery/Videos/captured_video_{timestamp}.mp4"
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        self.out = cv2.VideoWriter(self.video_filename, fourcc, 20.0, (self.cam_width, self.cam_height))
+        self.out = cv2.VideoWriter(self.video_filename, fourcc, self.cam_fps, (self.cam_width, self.cam_height))
 
+        # The recorder gets its own deep queue so it sees every frame at sensor rate
+        self.record_frames = self.bus.subscribe(maxsize=int(self.cam_fps * 4), drop="oldest")
+        self.recorder_stopping = False
         self.recording_thread = threading.Thread(target=self.record_video)
         self.recording_thread.start()
 
     def stop_video_recording(self):
         self.recording = False
+        # No new frames after this; the recorder writes out what is still queued, then exits
+        self.bus.unsubscribe(self.record_frames)
+        self.recorder_stopping = True
         self.recording_thread.join()  # Ensure the recording thread has finished
         self.out.release()
-        print(f"Video saved as {self.video_filename}")
+        print(f"Video saved as {self.video_filename} ({self.record_frames.dropped} frames dropped)")
+        self.record_frames = None
 
     def record_video(self):
-        last_frame_time = datetime.datetime.now()
-
-        while self.recording:
-            if not self.paused:
-                ret, frame = self.vid.read()
-                if ret:
-                    # Calculate the time since the last frame
-                    now = datetime.datetime.now()
-                    time_diff = (now - last_frame_time).total_seconds()
-
-                    # Maintain the frame rate by skipping writing during the pause
-                    if time_diff >= 1 / 20.0:  # 20 frames per second (FPS)
-                        self.add_date_time_overlay(frame, self.cam_width, self.cam_height)
-                        self.out.write(frame)
-                        last_frame_time = now
+        while True:
+            frame = self.record_frames.get(timeout=0.1)
+            if frame is None:
+                if self.recorder_stopping:
+                    break
+                continue
+            # Frames that arrive during the pause are discarded
+            if self.paused:
+                continue
+            if self.record_zoomed and self.zoom.zoomed:
+                # Scaled back up to the size the writer was opened with
+                image = cv2.resize(self.zoom.crop(frame.image), (self.cam_width, self.cam_height), interpolation=cv2.INTER_LINEAR)
+            else:
+                image = frame.image.copy()
+            self.add_date_time_overlay(image, self.cam_width, self.cam_height, frame.wall_time)
+            self.out.write(image)
 
     def update_timer(self):
         if self.recording_start_time and not self.paused:
             # Only update timer if not paused
             elapsed_time = datetime.datetime.now() - self.recording_start_time - self.paused_duration
             elapsed_str = str(elapsed_time).split('.')[0]
-            self.recording_timer_label.config(text=elapsed_str)
+            self.set_timer_text(elapsed_str)
         elif self.paused:
             # Keep the timer showing the same paused time
             elapsed_time = self.pause_start_time - self.recording_start_time - self.paused_duration
             elapsed_str = str(elapsed_time).split('.')[0]
-            self.recording_timer_label.config(text=elapsed_str)
+            self.set_timer_text(elapsed_str)
+
+    def set_timer_text(self, text, force=False):
+        # The text only changes once a second, so most frames leave the canvas untouched
+        if not force and self.canvas.itemcget(self.timer_item, "text") == text:
+            return
+        self.canvas.itemconfig(self.timer_item, text=text)
+        bbox = self.canvas.bbox(self.timer_item)
+        if bbox:
+            x1, y1, x2, y2 = bbox
+            self.canvas.coords(self.timer_background, x1 - 4, y1, x2 + 4, y2)
 
     def capture_image(self):
-        if hasattr(self, 'current_frame'):
-            os.makedirs("Gallery/Images", exist_ok=True)
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"Gallery/Images/captured_image_{timestamp}.jpg"
-            save_frame = cv2.cvtColor(self.current_frame, cv2.COLOR_RGB2BGR)
-            cv2.imwrite(filename, save_frame)
-            print(f"Image saved as {filename}")
+        frame = self.still_frames.get_nowait()
+        if frame is not None:
+            save_frame = frame.image.copy()
+            self.add_date_time_overlay(save_frame, self.cam_width, self.cam_height, frame.wall_time)
+        elif hasattr(self, 'current_frame'):
+            save_frame = self.current_frame
+        else:
+            return
+        os.makedirs("Gallery/Images", exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"Gallery/Images/captured_image_{timestamp}.jpg"
+        cv2.imwrite(filename, save_frame)
+        print(f"Image saved as {filename}")
 
     def open_gallery(self):
         gallery_path = os.path.abspath("Gallery")
@@ -211,8 +270,17 @@ class CameraApp:
             print(f"Error opening gallery: {e}")
 
     def close_app(self):
-        if self.vid.isOpened():
-            self.vid.release()
+        # Finish the recording first, otherwise its thread never exits and the file is left unfinished
+        if self.recording:
+            self.stop_video_recording()
+        self.pacer.stop()
+        print(f"Preview pacing: {self.pacer.summary()}")
+        self.watchdog.stop()
+        self.grabber.stop()
+        print(f"Preview: {self.frame_stats.summary()}")
+        print(f"Overlay: {self.text_cache.summary()}")
+        if self.grabber.cap.isOpened():
+            self.grabber.cap.release()
         self.window.quit()
 
 # Create a window and pass it to the CameraApp class
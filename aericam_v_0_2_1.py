@@ -1,76 +1,96 @@
 import tkinter as tk
 from tkinter import *
 import cv2
-from PIL import Image, ImageTk
 import os
 import datetime
 import webbrowser
 import sys
 import serial
 import math
+import time
+import base64
 import numpy as np
 import serial.tools.list_ports
+from capture import FramePool, FrameRing, format_camera_report
+from frame_source import SOURCE_ENV, open_source
+from multicam import CameraFeed, Composite
+from quality import LOW_POWER_PREVIEW, QualityController
+from display import GeometryTracker, VisibilityTracker, ZoomView, bind_zoom_controls, open_display_surface, scaling_plan
+from layout import OverlayLayout, load_overlay_layout
+from pacing import TkFramePacer
+from telemetry import RollReader
 
 session_name = ""
+# Where and how the radar and overlay text are drawn comes from config.json
+overlay_layout = load_overlay_layout(order="BGR")
 
 def create_directories():
     if not os.path.exists('Gallery'):
         os.makedirs('Gallery')
 
-def initialize_webcam():
-    cap = cv2.VideoCapture(0)
+def initialize_webcam(spec=None):
+    cap = open_source(spec, 1280, 720, fps=30)
+    print(format_camera_report(cap.report))
     if not cap.isOpened():
-        print("Error: Could not open webcam.")
-        sys.exit()
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-    return cap
-
-def capture_photo(frame, roll_value):
-    draw_radar(frame, roll_value)
-    add_overlay_text(frame, roll_value)
-    now = datetime.datetime.now()
-    timestamp = now.strftime("%Y%m%d_%H%M%S")
+        # The watchdog keeps retrying, so a camera plugged in later is picked up
+        print("Warning: Could not open webcam, waiting for it to be connected.")
+    return cap, cap.report
+
+def capture_photo(frame):
+    # Stills get their own overlay pass on a copy of the clean native-resolution frame
+    image = frame.image.copy()
+    # Same needle as the preview showed, not the raw roll reading
+    angle_rad = frame.angle if frame.angle is not None else roll_angle(frame.roll)
+    draw_overlay(image, frame, angle_rad)
+    timestamp = frame.wall_time.strftime("%Y%m%d_%H%M%S")
     photo_path = os.path.join('Gallery', f'captured_image_{timestamp}.jpg')
-    cv2.imwrite(photo_path, frame)
+    cv2.imwrite(photo_path, image)
     print(f"Photo saved to {photo_path}")
 
 def start_video_recording():
-    global out, recording_start_time, pause_start_time, paused, total_pause_duration
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    video_path = os.path.join('Gallery', f'captured_video_{timestamp}.avi')
-    fourcc = cv2.VideoWriter_fourcc(*'XVID')
-    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    out = cv2.VideoWriter(video_path, fourcc, 20.0, (frame_width, frame_height))
+    global recording_start_time, pause_start_time, paused, total_pause_duration
+    # Set before the recorders start, their first frames already need the timer
     recording_start_time = datetime.datetime.now()
     total_pause_duration = datetime.timedelta()
     paused = False
-    print(f"Started recording video: {video_path}")
+    timestamp = recording_start_time.strftime("%Y%m%d_%H%M%S")
+    fourcc = cv2.VideoWriter_fourcc(*'XVID')
+    # Each camera is recorded by its own feed recorder at native resolution and the
+    # camera's measured rate, independent of the preview tick and quality level. It
+    # draws its own overlay pass, or records clean with a telemetry sidecar.
+    for feed in feeds:
+        suffix = f'_cam{feed.index}' if composite is not None else ''
+        video_path = os.path.join('Gallery', f'captured_video_{timestamp}{suffix}.avi')
+        telemetry_path = os.path.splitext(video_path)[0] + '.csv' if clean_recording else None
+        fps = feed.start_recording(video_path, fourcc, recording_renderer(), telemetry_path)
+        print(f"Started recording video: {video_path} at {fps:.1f} fps")
+
+def stop_video_recording():
+    for feed in feeds:
+        feed.stop_recording()
+    if clean_recording:
+        print("Telemetry saved next to the video, burn in the overlay with: python export.py <video>")
 
 # Global variables to store previous radar values
 previous_angle_rad = None
 
-def draw_radar(frame, roll_value):
-    global previous_angle_rad
-    min_dimension = min(frame.shape[1], frame.shape[0])
-    min_radius = min_dimension // 8
-    angle = (90 - float(roll_value)) % 360
-    angle_rad = math.radians(angle)
+def roll_angle(roll_value):
+    return math.radians((90 - float(roll_value)) % 360)
+
+def smooth_angle(previous_angle_rad, roll_value):
+    angle_rad = roll_angle(roll_value)
     if previous_angle_rad is None:
-        previous_angle_rad = angle_rad
+        return angle_rad
     transition_speed = 0.1
     diff_angle_rad = angle_rad - previous_angle_rad
     diff_angle_rad = (diff_angle_rad + np.pi) % (2 * np.pi) - np.pi
-    smoothed_angle_rad = previous_angle_rad + transition_speed * diff_angle_rad
-    previous_angle_rad = smoothed_angle_rad
-    center = (frame.shape[1] - min_radius - 20, min_radius + 20)
-    radar_x = int(center[0] + min_radius * math.cos(smoothed_angle_rad))
-    radar_y = int(center[1] - min_radius * math.sin(smoothed_angle_rad))
-    cv2.line(frame, center, (radar_x, radar_y), (255, 0, 0), 2)
-    cv2.circle(frame, center, min_radius, (255, 255, 255), 2)
-    cv2.line(frame, (center[0], center[1] - min_radius), (center[0], center[1] + min_radius), (255, 255, 255), 1)
-    cv2.line(frame, (center[0] - min_radius, center[1]), (center[0] + min_radius, center[1]), (255, 255, 255), 1)
+    return previous_angle_rad + transition_speed * diff_angle_rad
+
+def smooth_roll_angle(roll_value):
+    # Called once per preview frame, each feed recorder smooths the needle on its own
+    global previous_angle_rad
+    previous_angle_rad = smooth_angle(previous_angle_rad, roll_value)
+    return previous_angle_rad
 
 def show_alert_box():
     def on_okay():
@@ -96,69 +116,164 @@ def show_alert_box():
 
     session_name_window.grab_set()  # Make the window modal
 
-def add_overlay_text(frame, roll_value):
-    font = cv2.FONT_HERSHEY_SIMPLEX
-    min_dimension = min(frame.shape[1], frame.shape[0])
-    min_radius = min_dimension // 8
-    radar_center_x = frame.shape[1] - min_radius - 20
-    text_y = min_radius * 2 + 50
-    cv2.putText(frame, f"Rotation Roll: {roll_value}", (radar_center_x - min_radius - 100, text_y), font, 0.8, (255, 0, 0), 2, cv2.LINE_AA)
-    now = datetime.datetime.now()
-    date_time_str = now.strftime("%d/%m/%Y - %H:%M:%S")
-    font_scale = 0.8
-    font_thickness = 2
-    text_size, _ = cv2.getTextSize(date_time_str, font, font_scale, font_thickness)
-    text_x = frame.shape[1] - text_size[0] - 10
-    text_y = frame.shape[0] - 10
-    cv2.putText(frame, date_time_str, (text_x, text_y), font, font_scale, (255, 255, 255), font_thickness, cv2.LINE_AA)
-    # Add session name to the frame
-    if session_name:
-        session_name_text = f"Session: {session_name}"
-        cv2.putText(frame, session_name_text, (frame.shape[1] - 200, 30), font, 1, (0, 255, 0), 2, cv2.LINE_AA)
+def recording_timer_text(now):
+    if paused:
+        elapsed_time = pause_start_time - recording_start_time - total_pause_duration
+    else:
+        elapsed_time = now - recording_start_time - total_pause_duration
+    minutes, seconds = divmod(max(0, int(elapsed_time.total_seconds())), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+def draw_overlay(frame, captured, angle_rad, timer_text=None, line_type=cv2.LINE_AA, layout=None):
+    # The layout is compiled once per frame size, so each output branch gets its own ops
+    values = {"angle": angle_rad, "roll": captured.roll, "now": captured.wall_time, "time": captured.timestamp,
+              "session": session_name, "timer": timer_text}
+    (layout or overlay_layout).draw(frame, values, line_type)
+
+def recording_renderer():
+    # One per feed recorder, called on its thread for every recorded frame. It keeps its
+    # own needle smoothing, overlay layout and output buffer, so nothing it touches is
+    # shared with the preview or another recorder.
+    layout = OverlayLayout(overlay_layout.spec, "BGR")
+    angle_rad = None
+    buffer = None
+
+    def render(frame, telemetry):
+        nonlocal angle_rad, buffer
+        angle_rad = smooth_angle(angle_rad, frame.roll)
+        timer_text = recording_timer_text(frame.wall_time)
+        image = frame.image
+        if buffer is None or buffer.shape != image.shape:
+            buffer = np.empty_like(image)
+        if record_zoomed and zoom.zoomed:
+            # The zoomed view, scaled back up to the native frame size
+            cv2.resize(zoom.crop(image), (image.shape[1], image.shape[0]), dst=buffer, interpolation=cv2.INTER_LINEAR)
+            image = buffer
+        if telemetry is not None:
+            telemetry.write(frame, angle_rad, timer_text, session_name)
+            return image
+        if image is not buffer:
+            np.copyto(buffer, image)
+        draw_overlay(buffer, frame, angle_rad, timer_text, layout=layout)
+        return buffer
+    return render
+
+def compose_frame(window_width, window_height, render=True):
+    # Tiles are only redrawn for cameras that delivered a new frame
+    if render:
+        composite.resize(window_width, window_height)
+    newest = None
+    for feed in feeds:
+        ret, captured = feed.grabber.read()
+        if not ret:
+            continue
+        feed.stats.update(captured)
+        if render:
+            composite.update(feed.index, captured.image)
+        feed.grabber.release(captured)
+        if newest is None:
+            newest = captured
+    if newest is None:
+        return False, None, None
+    if not render:
+        return True, newest, None
+    frame = frame_pool.acquire(composite.canvas.shape)
+    np.copyto(frame, composite.canvas)
+    return True, newest.replace(frame), frame
 
 def show_frame():
-    global last_roll_value, paused, total_pause_duration, pause_start_time
-    ret, frame = cap.read()
+    # Called by the frame pacer, returns True when a new frame was rendered
+    settings = quality.settings
+    if not recording and low_power_active():
+        settings = LOW_POWER_PREVIEW
+    pacer.set_rate(settings["max_fps"] or camera_fps)
+    tick_start = time.perf_counter()
+    # Under CPU pressure the preview is rendered smaller than the window
+    window_width, window_height = geometry.current()
+    window_width = max(1, int(window_width * settings["preview_scale"]))
+    window_height = max(1, int(window_height * settings["preview_scale"]))
+    line_type = cv2.LINE_AA if settings["overlay"] == "full" else cv2.LINE_8
+    # A tick that was already scheduled can still arrive after the window was hidden
+    preview = visibility.visible
+    if composite is not None:
+        ret, captured, image = compose_frame(window_width, window_height, preview)
+    else:
+        ret, captured = grabber.read()
+        if ret:
+            image = captured.image
+            frame_stats.update(captured)
     if ret:
-        window_width = root.winfo_width()
-        window_height = root.winfo_height()
-        frame = cv2.resize(frame, (window_width, window_height))
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        roll_value = last_roll_value
-        if serial_conn.in_waiting > 0:
-            line = serial_conn.readline().decode('utf-8').strip()
-            print(f"Serial line read: {line}")
-            if line.startswith("roll ="):
-                parts = line.split(',')
-                roll_value = parts[0].split('=')[1].strip()
-                last_roll_value = roll_value
-        draw_radar(frame, roll_value)
-        add_overlay_text(frame, roll_value)
-        if recording:
-            if paused:
-                elapsed_time = pause_start_time - recording_start_time - total_pause_duration
-            else:
-                elapsed_time = datetime.datetime.now() - recording_start_time - total_pause_duration
-            minutes, seconds = divmod(int(elapsed_time.total_seconds()), 60)
-            hours, minutes = divmod(minutes, 60)
-            timer_text = f"{hours:02}:{minutes:02}:{seconds:02}"
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            cv2.putText(frame, timer_text, (frame.shape[1] // 2 - 50, 30), font, 0.8, (255, 0, 0), 2, cv2.LINE_AA)
-            if not paused:
-                out.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
-        img = Image.fromarray(frame)
-        imgtk = ImageTk.PhotoImage(image=img)
-        rt.imgtk = imgtk
-        rt.configure(image=imgtk)
-    root.after(10, show_frame)
+        angle_rad = smooth_roll_angle(captured.roll)
+        timer_text = recording_timer_text(captured.wall_time) if recording else None
+        if not preview:
+            # The composite is not built while hidden, a single camera's frame goes back to its grabber
+            if composite is None:
+                grabber.release(captured)
+            return True
+        # Only the preview is scaled to the window, into a pooled buffer. The zoomed
+        # region is a view of the frame, so zooming in shrinks the resize
+        view = zoom.crop(image)
+        plan = scaling_plan((view.shape[1], view.shape[0]), (window_width, window_height))
+        frame = frame_pool.acquire((plan.size[1], plan.size[0], 3))
+        if plan.skip:
+            np.copyto(frame, view)
+        else:
+            cv2.resize(view, plan.size, dst=frame, interpolation=plan.interpolation)
+        draw_overlay(frame, captured, angle_rad, timer_text, line_type)
+        if display_surface.update(frame):
+            rt.configure(image=display_surface.photo)
+        frame_pool.release(frame)
+        # The clean native frame is kept for stills, with the angle it was shown with
+        captured.angle = angle_rad
+        shown_frames.push(captured)
+        quality.record(time.perf_counter() - tick_start, recording)
+    return ret
+
+def low_power_active():
+    if low_power_mode == "idle":
+        return visibility.idle_for() > idle_seconds
+    return low_power_mode == "on"
+
+def on_visibility_change(visible):
+    # Capture and recording carry on either way, only the preview stops
+    if visible:
+        for feed in feeds:
+            feed.stats.skip()
+        pacer.resume()
+        print("Preview resumed.")
+    else:
+        # The recorders are fed by their capture threads, so the pacer can always stop
+        pacer.stop()
+        print("Preview suspended while the window is hidden.")
+
+def preview_rect():
+    # The label centres the preview image, which can be smaller than the window
+    if display_surface.size is None:
+        return None
+    width, height = display_surface.size
+    return (rt.winfo_width() - width) // 2, (rt.winfo_height() - height) // 2, width, height
+
+def toggle_record_view(event=None):
+    global record_zoomed
+    if composite is not None:
+        # The zoom is of the combined preview, each camera is still recorded in full
+        print("Zoomed recording is only available with a single camera.")
+        return
+    record_zoomed = not record_zoomed
+    print(f"Recording the {'zoomed view' if record_zoomed else 'full frame'}.")
+
+def mark_photo_press(event):
+    global photo_pressed_at
+    photo_pressed_at = time.monotonic()
 
 def capture_photo_callback():
-    ret, frame = cap.read()
-    if ret:
-        window_width = root.winfo_width()
-        window_height = root.winfo_height()
-        frame = cv2.resize(frame, (window_width, window_height))
-        capture_photo(frame, last_roll_value)
+    global photo_pressed_at
+    # Use the frame that was on screen when the button went down
+    frame = shown_frames.at(photo_pressed_at or time.monotonic())
+    photo_pressed_at = None
+    if frame is not None:
+        capture_photo(frame)
         photo_button.config(bg='green')
         root.after(500, lambda: photo_button.config(bg='white'))
 
@@ -170,11 +285,12 @@ def start_video_recording_callback():
         video_button.config(image=stop_recording_img, bg='red', fg='white', relief=SUNKEN)
         pause_button.pack(pady=10)
     else:
-        out.release()
+        stop_video_recording()
         recording = False
         video_button.config(image=start_recording_img, bg='white', fg='black', relief=RAISED)
         pause_button.pack_forget()
         print("Stopped recording video.")
+        print(f"Preview: {frame_stats.summary()}")
         show_alert_box()  # Show the alert box after stopping recording
 
 def pause_video_recording_callback():
@@ -182,20 +298,27 @@ def pause_video_recording_callback():
     if not paused:
         pause_start_time = datetime.datetime.now()
         paused = True
+        for feed in feeds:
+            feed.paused = True
         pause_button.config(image=resume_button_img, bg='yellow', fg='black', relief=SUNKEN)
     else:
         pause_duration = datetime.datetime.now() - pause_start_time
         total_pause_duration += pause_duration
         paused = False
+        for feed in feeds:
+            feed.paused = False
         pause_button.config(image=pause_button_img, bg='white', fg='black', relief=RAISED)
 
 def load_image(image_path, size):
     try:
         if getattr(sys, 'frozen', False):
             image_path = os.path.join(sys._MEIPASS, image_path)
-        image = Image.open(image_path)
-        image = image.resize((size, size), Image.Resampling.LANCZOS)
-        return ImageTk.PhotoImage(image)
+        # Decoded and resized with OpenCV and handed to Tk as PNG, so Pillow is only
+        # imported when the pil display backend is used; the alpha channel is kept
+        image = cv2.imdecode(np.fromfile(image_path.replace('\\', os.sep), np.uint8), cv2.IMREAD_UNCHANGED)
+        image = cv2.resize(image, (size, size), interpolation=cv2.INTER_LANCZOS4)
+        _, png = cv2.imencode('.png', image)
+        return tk.PhotoImage(data=base64.b64encode(png.tobytes()), format='png')
     except FileNotFoundError:
         print(f"Error: File '{image_path}' not found.")
         return None
@@ -212,11 +335,14 @@ def find_serial_port():
 
 # Initialize
 create_directories()
-cap = initialize_webcam()
+# AERICAM_SOURCE may list several sources separated by commas, e.g. "0,1" for a forward and a nadir camera
+cameras = [initialize_webcam(spec) for spec in os.environ.get(SOURCE_ENV, "0").split(",")]
 recording = False
 paused = False
 recording_start_time = None
 total_pause_duration = datetime.timedelta()
+# AERICAM_CLEAN_RECORDING=1 records without the overlay plus a telemetry sidecar (see export.py)
+clean_recording = os.environ.get("AERICAM_CLEAN_RECORDING", "0") == "1"
 
 # Initialize serial connection to Arduino
 try:
@@ -226,10 +352,21 @@ except RuntimeError as e:
     sys.exit()
 
 baud_rate = 9600
-serial_conn = serial.Serial(serial_port, baud_rate)
-
-# Global variable to store last roll value
-last_roll_value = "0"
+serial_conn = serial.Serial(serial_port, baud_rate, timeout=0.5)
+roll_reader = RollReader(serial_conn).start()
+
+# Every captured frame is stamped with the roll sample current at capture time
+frame_pool = FramePool(size=4 + 2 * len(cameras))
+shown_frames = FrameRing(size=8, pool=frame_pool)
+photo_pressed_at = None
+feeds = [CameraFeed(index, cap, pool=frame_pool, roll_source=roll_reader.latest,
+                    placeholder_size=report.get("requested_size", (1280, 720))).start()
+         for index, (cap, report) in enumerate(cameras)]
+grabber = feeds[0].grabber
+frame_stats = feeds[0].stats
+composite = Composite(len(feeds), os.environ.get("AERICAM_LAYOUT", "tiled")) if len(feeds) > 1 else None
+camera_fps = grabber.cap.get(cv2.CAP_PROP_FPS) or 30.0
+quality = QualityController(budget=1.0 / camera_fps)
 
 root = tk.Tk()
 root.title("AeriCam")
@@ -244,6 +381,19 @@ canvas.pack(fill=BOTH, expand=YES)
 # Video feed label
 rt = Label(canvas, bg='black')
 rt.place(relwidth=1, relheight=1)
+display_surface = open_display_surface()
+geometry = GeometryTracker(root)
+visibility = VisibilityTracker(root, on_visibility_change)
+# AERICAM_LOW_POWER=on always uses the low-power preview when not recording, "idle" only
+# after AERICAM_IDLE_SECONDS without mouse or keyboard input
+low_power_mode = os.environ.get("AERICAM_LOW_POWER", "off").lower()
+idle_seconds = float(os.environ.get("AERICAM_IDLE_SECONDS", "60"))
+# Digital zoom and pan of the preview; Z switches the recorder between the full frame and the zoomed view
+zoom = ZoomView()
+record_zoomed = False
+bind_zoom_controls(root, rt, zoom, preview_rect)
+root.bind('z', toggle_record_view)
+root.bind('Z', toggle_record_view)
 
 # Load images for buttons
 photo_button_img = load_image(r'images\photo_button.png', 48)
@@ -263,6 +413,7 @@ button_frame = Frame(canvas, bg='black', bd=0, highlightthickness=0)
 button_frame.place(relx=0.95, rely=0.5, anchor=CENTER)
 
 photo_button = Button(button_frame, image=photo_button_img, command=capture_photo_callback, bg='white', bd=0, relief=RAISED)
+photo_button.bind('<ButtonPress-1>', mark_photo_press)
 photo_button.pack(pady=10)
 
 video_button = Button(button_frame, image=start_recording_img, command=start_video_recording_callback, bg='white', bd=0, relief=RAISED)
@@ -273,10 +424,15 @@ pause_button = Button(button_frame, image=pause_button_img, command=pause_video_
 gallery_button = Button(button_frame, image=gallery_button_img, command=open_gallery, bg='white', bd=0, relief=RAISED)
 gallery_button.pack(pady=10)
 
-show_frame()
+pacer = TkFramePacer(root, show_frame, camera_fps).start()
 root.mainloop()
 
 if recording:
-    out.release()
-cap.release()
+    stop_video_recording()
+print(f"Preview pacing: {pacer.summary()}")
+print(f"Overlay: {overlay_layout.text_cache.summary()}")
+for feed in feeds:
+    print(f"Camera {feed.index}: {feed.stats.summary()}")
+    feed.stop()
+roll_reader.stop()
 serial_conn.close()
@@ -0,0 +1,198 @@
+import argparse
+import os
+import time
+import tkinter as tk
+import cv2
+from PIL import Image, ImageTk
+from capture import CaptureThread, FramePool, FrameStats, format_camera_report
+from display import DisplaySurface, PPMDisplaySurface
+from frame_source import open_source
+
+
+class StageTimer:
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    def add(self, stage, seconds):
+        self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def report(self):
+        lines = []
+        for stage, total in self.totals.items():
+            lines.append(f"  {stage:<12} {total / self.counts[stage] * 1000:7.2f} ms/frame")
+        return "\n".join(lines)
+
+
+def preview_frames(source, preview_size, count=8):
+    frames = []
+    for _ in range(count):
+        ret, image = source.read()
+        if ret:
+            frames.append(cv2.resize(image, preview_size))
+    return frames
+
+
+def run_display(source, preview_size, seconds):
+    # Needs a display: compares a new ImageTk.PhotoImage per frame with the reused
+    # DisplaySurface (Pillow) and PPMDisplaySurface
+    width, height = preview_size
+    frames = preview_frames(source, preview_size)
+    if not frames:
+        print("Error: no frames to display.")
+        return
+    root = tk.Tk()
+    label = tk.Label(root)
+    label.pack()
+    surface = DisplaySurface()
+    ppm_surface = PPMDisplaySurface()
+
+    def per_frame_photo(frame):
+        photo = ImageTk.PhotoImage(image=Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+        label.imgtk = photo
+        label.configure(image=photo)
+
+    def reused_surface(frame):
+        if surface.update(frame):
+            label.configure(image=surface.photo)
+
+    def ppm(frame):
+        if ppm_surface.update(frame):
+            label.configure(image=ppm_surface.photo)
+
+    for name, show in (("PhotoImage", per_frame_photo), ("surface", reused_surface), ("ppm", ppm)):
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds / 3:
+            show(frames[count % len(frames)])
+            root.update()
+            count += 1
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<12} {elapsed / count * 1000:7.2f} ms/frame ({count} frames at {width}x{height})")
+    root.destroy()
+
+
+def run_kivy_display(source, preview_size, seconds):
+    # Needs a display and Kivy: compares a new flipped texture per frame (the old
+    # main_kivy path) with one persistent texture flipped through its coordinates.
+    # Kivy is imported here because it is optional and parses argv on import.
+    os.environ.setdefault("KIVY_NO_ARGS", "1")
+    from kivy.app import App
+    from kivy.clock import Clock
+    from kivy.graphics.texture import Texture
+    from kivy.uix.image import Image as KivyImage
+
+    width, height = preview_size
+    frames = preview_frames(source, preview_size)
+    if not frames:
+        print("Error: no frames to display.")
+        return
+
+    class KivyBenchmarkApp(App):
+        def build(self):
+            self.image = KivyImage()
+            self.texture = None
+            self.modes = [("Texture.create", self.per_frame_texture), ("persistent", self.persistent_texture)]
+            self.mode_index = 0
+            self.start_mode()
+            Clock.schedule_interval(self.step, 0)
+            return self.image
+
+        def start_mode(self):
+            self.count = 0
+            self.upload_time = 0.0
+            self.started = time.perf_counter()
+
+        def per_frame_texture(self, frame):
+            buf = cv2.flip(frame, 0).tobytes()
+            texture = Texture.create(size=(width, height), colorfmt='bgr')
+            texture.blit_buffer(buf, colorfmt='bgr', bufferfmt='ubyte')
+            self.image.texture = texture
+
+        def persistent_texture(self, frame):
+            if self.texture is None:
+                self.texture = Texture.create(size=(width, height), colorfmt='bgr')
+                self.texture.flip_vertical()
+                self.image.texture = self.texture
+            self.texture.blit_buffer(frame.reshape(-1), colorfmt='bgr', bufferfmt='ubyte')
+            self.image.canvas.ask_update()
+
+        def step(self, dt):
+            name, show = self.modes[self.mode_index]
+            t0 = time.perf_counter()
+            show(frames[self.count % len(frames)])
+            self.upload_time += time.perf_counter() - t0
+            self.count += 1
+            elapsed = time.perf_counter() - self.started
+            if elapsed < seconds / 2:
+                return True
+            print(f"  {name:<14} {self.upload_time / self.count * 1000:7.2f} ms/frame upload, "
+                  f"{self.count / elapsed:.1f} fps ({self.count} frames at {width}x{height})")
+            self.mode_index += 1
+            if self.mode_index == len(self.modes):
+                self.stop()
+                return False
+            self.start_mode()
+            return True
+
+    KivyBenchmarkApp().run()
+
+
+def run(source, preview_size, seconds):
+    pool = FramePool()
+    stats = FrameStats()
+    timer = StageTimer()
+    grabber = CaptureThread(source, pool=pool).start()
+    width, height = preview_size
+    start = time.monotonic()
+    while time.monotonic() - start < seconds:
+        ret, captured = grabber.read()
+        if not ret:
+            time.sleep(0.001)
+            continue
+        stats.update(captured)
+        t0 = time.perf_counter()
+        frame = pool.acquire((height, width, 3))
+        cv2.resize(captured.image, (width, height), dst=frame)
+        grabber.release(captured)
+        t1 = time.perf_counter()
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+        t2 = time.perf_counter()
+        Image.fromarray(frame)
+        t3 = time.perf_counter()
+        pool.release(frame)
+        timer.add("resize", t1 - t0)
+        timer.add("cvtColor", t2 - t1)
+        timer.add("fromarray", t3 - t2)
+    grabber.stop()
+    elapsed = time.monotonic() - start
+    print(f"Captured {grabber.frame_id / elapsed:.1f} fps, processed {stats.frames / elapsed:.1f} fps")
+    print(stats.summary())
+    print(timer.report())
+    print(f"Frame pool allocations: {pool.allocated}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless AeriCam pipeline benchmark")
+    parser.add_argument("--source", default="synthetic", help="camera index, video file or synthetic[:WxH[@FPS]]")
+    parser.add_argument("--preview", default="1280x720", help="preview size as WIDTHxHEIGHT")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--display", action="store_true", help="benchmark the Tk display paths (needs a display)")
+    parser.add_argument("--kivy", action="store_true", help="benchmark the Kivy texture paths (needs a display and Kivy)")
+    args = parser.parse_args()
+
+    source = open_source(args.source, 1280, 720, fps=30)
+    if not source.isOpened():
+        print(f"Error: Could not open source {args.source}.")
+        raise SystemExit(1)
+    if source.report is not None:
+        print(format_camera_report(source.report))
+    preview_size = tuple(int(value) for value in args.preview.lower().split("x"))
+    if args.display:
+        run_display(source, preview_size, args.seconds)
+    elif args.kivy:
+        run_kivy_display(source, preview_size, args.seconds)
+    else:
+        run(source, preview_size, args.seconds)
+    source.release()
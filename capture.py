@@ -0,0 +1,491 @@
+import datetime
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+import numpy as np
+import cv2
+
+
+class Frame:
+    # Capture metadata that travels with the image through overlay, display, recording and stills
+    __slots__ = ("image", "seq", "timestamp", "wall_time", "roll", "placeholder", "shared", "angle")
+
+    def __init__(self, image, seq, timestamp, wall_time, roll=None, placeholder=False):
+        self.image = image
+        self.seq = seq
+        self.timestamp = timestamp  # time.monotonic() when the read returned
+        self.wall_time = wall_time
+        self.roll = roll
+        self.placeholder = placeholder  # Inserted by the watchdog while the camera is reconnecting
+        self.shared = False  # Also delivered to bus subscribers, so the image must never be pooled
+        self.angle = None  # Smoothed radar angle the frame was shown with, set by the UI
+
+    def replace(self, image):
+        frame = Frame(image, self.seq, self.timestamp, self.wall_time, self.roll, self.placeholder)
+        frame.angle = self.angle
+        return frame
+
+    def copy(self):
+        return self.replace(self.image.copy())
+
+    def age(self):
+        return time.monotonic() - self.timestamp
+
+
+class FrameStats:
+    def __init__(self):
+        self.frames = 0
+        self.dropped = 0
+        self.last_seq = None
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def update(self, frame):
+        latency = frame.age()
+        if self.last_seq is not None and frame.seq > self.last_seq + 1:
+            self.dropped += frame.seq - self.last_seq - 1
+        self.last_seq = frame.seq
+        self.frames += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def skip(self):
+        # Frames left unread on purpose (e.g. a suspended preview) are not counted as dropped
+        self.last_seq = None
+
+    def summary(self):
+        average = self.total_latency / self.frames if self.frames else 0.0
+        return (f"{self.frames} frames shown, {self.dropped} dropped, "
+                f"latency avg {average * 1000:.1f} ms, max {self.max_latency * 1000:.1f} ms")
+
+
+class Subscriber:
+    def __init__(self, maxsize=1, drop="oldest"):
+        self.queue = queue.Queue(maxsize)
+        self.drop = drop  # "oldest" keeps the newest frames, "newest" keeps the queued ones
+        self.dropped = 0
+
+    def put(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+            return
+        except queue.Full:
+            self.dropped += 1
+            if self.drop == "newest":
+                return
+        try:
+            self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            pass
+
+    def get(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def get_nowait(self):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+
+class FrameBus:
+    # Frames are shared between subscribers, so consumers must not draw on them in place
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = []
+
+    def subscribe(self, maxsize=1, drop="oldest"):
+        subscriber = Subscriber(maxsize, drop)
+        with self.lock:
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def publish(self, frame):
+        # Returns how many subscribers the frame was handed to
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.put(frame)
+        return len(subscribers)
+
+
+class FramePool:
+    # Reusable frame buffers keyed by shape, so the pipeline stops allocating a new array per frame
+    def __init__(self, size=4, max_shapes=4):
+        self.size = size
+        self.max_shapes = max_shapes
+        self.lock = threading.Lock()
+        self.free = OrderedDict()
+        self.allocated = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype))
+        with self.lock:
+            buffers = self.free.get(key)
+            if buffers:
+                self.free.move_to_end(key)
+                return buffers.pop()
+            self.allocated += 1
+        return np.empty(shape, dtype)
+
+    def release(self, frame):
+        if frame is None:
+            return
+        key = (frame.shape, frame.dtype)
+        with self.lock:
+            buffers = self.free.setdefault(key, [])
+            self.free.move_to_end(key)
+            if len(buffers) < self.size:
+                buffers.append(frame)
+            # Buffers for old window sizes are dropped once the window has been resized a few times
+            while len(self.free) > self.max_shapes:
+                self.free.popitem(last=False)
+
+
+class FrameRing:
+    # The last few displayed frames, so a still can be taken from what was on screen
+    # without another camera read. Used from the UI thread only.
+    def __init__(self, size=8, pool=None):
+        self.size = size
+        self.pool = pool
+        self.frames = deque()
+
+    def push(self, frame):
+        # Takes ownership of frame.image, evicted buffers go back to the pool
+        if len(self.frames) == self.size:
+            _, evicted = self.frames.popleft()
+            if self.pool is not None and not evicted.shared:
+                self.pool.release(evicted.image)
+        self.frames.append((time.monotonic(), frame))
+
+    def at(self, when):
+        for shown_at, frame in reversed(self.frames):
+            if shown_at <= when:
+                return frame
+        return self.frames[0][1] if self.frames else None
+
+
+class CaptureThread:
+    def __init__(self, cap, bus=None, pool=None, roll_source=None):
+        self.cap = cap
+        self.roll_source = roll_source
+        self.bus = bus
+        # Frames that reached a bus subscriber are marked shared and never recycled
+        self.pool = pool
+        self.lock = threading.Lock()
+        self.frame = None
+        self.frame_taken = False
+        self.frame_id = 0
+        self.published = 0
+        self.last_read_id = 0
+        self.failures = 0
+        self.last_frame_time = time.monotonic()
+        self.streaming = False  # The current device has delivered its first frame
+        self.generation = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.last_frame_time = time.monotonic()
+        self.streaming = False
+        self.thread = threading.Thread(target=self.run, args=(self.generation,), daemon=True)
+        self.thread.start()
+        return self
+
+    def grab(self, cap):
+        if self.pool is None or self.frame is None:
+            return cap.read()
+        buffer = self.pool.acquire(self.frame.image.shape, self.frame.image.dtype)
+        ret, frame = cap.read(image=buffer)
+        if not ret:
+            self.pool.release(buffer)
+        return ret, frame
+
+    def run(self, generation):
+        cap = self.cap
+        while self.running and generation == self.generation:
+            ret, image = self.grab(cap)
+            if generation != self.generation:
+                break
+            if not ret:
+                self.failures += 1
+                time.sleep(0.005)
+                continue
+            self.failures = 0
+            self.last_frame_time = time.monotonic()
+            self.streaming = True
+            self.publish(image)
+        if generation != self.generation:
+            # This device was replaced while the read was blocked
+            cap.release()
+
+    def publish(self, image, placeholder=False):
+        timestamp = time.monotonic()
+        wall_time = datetime.datetime.now()
+        roll = self.roll_source() if self.roll_source is not None else None
+        with self.lock:
+            self.published += 1
+            frame = Frame(image, self.published, timestamp, wall_time, roll, placeholder)
+        # Delivered to the bus before it is visible to read(), so shared is set before anyone can release it
+        if self.bus is not None:
+            frame.shared = self.bus.publish(frame) > 0
+        # Only the newest frame is kept, older ones are dropped
+        with self.lock:
+            previous, previous_taken = self.frame, self.frame_taken
+            self.frame_id += 1
+            self.frame = frame
+            self.frame_taken = False
+        if self.pool is not None and previous is not None and not previous_taken and not previous.shared:
+            self.pool.release(previous.image)
+
+    def inject(self, image):
+        # Placeholder frames are copied so the cached image never ends up in the pool
+        if self.pool is not None:
+            buffer = self.pool.acquire(image.shape, image.dtype)
+            np.copyto(buffer, image)
+        else:
+            buffer = image.copy()
+        self.publish(buffer, placeholder=True)
+
+    def swap(self, cap):
+        # A blocked read can't be interrupted, so the old reader is left to exit on its own
+        with self.lock:
+            self.generation += 1
+            self.cap = cap
+            self.failures = 0
+            self.streaming = False
+        if self.running:
+            self.thread = threading.Thread(target=self.run, args=(self.generation,), daemon=True)
+            self.thread.start()
+
+    def read(self):
+        # Non-blocking: returns False when no new frame arrived since the last read.
+        # With a pool the caller owns the frame until it is handed back with release().
+        with self.lock:
+            if self.frame is None or self.frame_id == self.last_read_id:
+                return False, None
+            self.last_read_id = self.frame_id
+            self.frame_taken = True
+            return True, self.frame
+
+    def release(self, frame):
+        if self.pool is None or frame.shared:
+            return
+        with self.lock:
+            if frame is self.frame:
+                # Still the latest frame, the capture thread recycles it once it is replaced
+                self.frame_taken = False
+                return
+        self.pool.release(frame.image)
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+
+class CaptureWatchdog:
+    # Reopens a stalled or failed camera in the background with exponential backoff,
+    # publishing placeholder frames so the preview and recording stay alive meanwhile.
+    # A freshly opened camera often needs a second or more for its first frame, so that
+    # one gets first_frame_timeout; reopening it early would leave a second handle that
+    # cannot stream while the first read is still blocked.
+    def __init__(self, grabber, stall_timeout=0.5, first_frame_timeout=5.0, max_failures=5, min_backoff=0.05,
+                 max_backoff=2.0, placeholder_size=(1280, 720)):
+        self.grabber = grabber
+        self.stall_timeout = stall_timeout
+        self.first_frame_timeout = first_frame_timeout
+        self.max_failures = max_failures
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.placeholder_size = placeholder_size
+        self.placeholder = None
+        self.connected = True
+        self.lost_at = None
+        self.backoff = min_backoff
+        self.next_attempt = 0.0
+        self.reconnect_thread = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stalled(self):
+        if self.grabber.failures >= self.max_failures:
+            return True
+        timeout = self.stall_timeout if self.grabber.streaming else self.first_frame_timeout
+        return time.monotonic() - self.grabber.last_frame_time > timeout
+
+    def placeholder_image(self):
+        if self.grabber.frame is not None:
+            shape = self.grabber.frame.image.shape
+        else:
+            shape = (self.placeholder_size[1], self.placeholder_size[0], 3)
+        if self.placeholder is None or self.placeholder.shape != shape:
+            image = np.zeros(shape, np.uint8)
+            text = "Camera reconnecting..."
+            font = cv2.FONT_HERSHEY_SIMPLEX
+            text_size, _ = cv2.getTextSize(text, font, 1, 2)
+            position = ((shape[1] - text_size[0]) // 2, (shape[0] + text_size[1]) // 2)
+            cv2.putText(image, text, position, font, 1, (255, 255, 255), 2, cv2.LINE_AA)
+            self.placeholder = image
+        return self.placeholder
+
+    def run(self):
+        fps = self.grabber.cap.get(cv2.CAP_PROP_FPS) if self.grabber.cap is not None else 0
+        interval = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        while self.running:
+            if self.connected and self.stalled():
+                self.connected = False
+                self.lost_at = time.monotonic()
+                self.backoff = self.min_backoff
+                self.next_attempt = self.lost_at
+                print("Camera stalled, reconnecting...")
+            if not self.connected:
+                if self.grabber.last_frame_time > self.lost_at:
+                    self.connected = True
+                    print(f"Camera reconnected after {(time.monotonic() - self.lost_at) * 1000:.0f} ms")
+                    continue
+                self.grabber.inject(self.placeholder_image())
+                reconnecting = self.reconnect_thread is not None and self.reconnect_thread.is_alive()
+                if not reconnecting and time.monotonic() >= self.next_attempt:
+                    self.reconnect_thread = threading.Thread(target=self.reconnect, daemon=True)
+                    self.reconnect_thread.start()
+                time.sleep(interval)
+            else:
+                time.sleep(min(interval, self.stall_timeout / 2))
+
+    def reconnect(self):
+        cap = self.grabber.cap.reopen()
+        if cap.isOpened():
+            self.grabber.swap(cap)
+            # Give the new device time to deliver its first frame before trying again
+            self.next_attempt = time.monotonic() + max(self.first_frame_timeout, self.backoff)
+        else:
+            cap.release()
+            self.next_attempt = time.monotonic() + self.backoff
+        self.backoff = min(self.backoff * 2, self.max_backoff)
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+
+def fourcc_to_str(value):
+    value = int(value)
+    return "".join(chr((value >> 8 * i) & 0xFF) for i in range(4)).strip("\x00 ")
+
+
+def camera_backends():
+    if sys.platform.startswith("linux"):
+        return [("V4L2", cv2.CAP_V4L2), ("default", cv2.CAP_ANY)]
+    if sys.platform.startswith("win"):
+        return [("DSHOW", cv2.CAP_DSHOW), ("default", cv2.CAP_ANY)]
+    return [("default", cv2.CAP_ANY)]
+
+
+def measure_fps(cap, frames=10):
+    # The first read after a format change is usually slow, so it is not timed
+    cap.read()
+    count = 0
+    start = time.monotonic()
+    for _ in range(frames):
+        ret, _ = cap.read()
+        if ret:
+            count += 1
+    elapsed = time.monotonic() - start
+    if count == 0 or elapsed <= 0:
+        return 0.0
+    return count / elapsed
+
+
+def configure_camera(cap, pixel_format, width, height, fps):
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*pixel_format))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+
+
+def open_camera(index=0, width=1280, height=720, fps=30, formats=("MJPG", "YUYV"), probe_frames=10):
+    # Tries each backend and pixel format until one reaches the target fps,
+    # otherwise keeps the fastest one. Returns (cap, report), cap is None on failure.
+    # V4L2 and DirectShow only let one handle stream from a device at a time, so every
+    # probe is released after it is measured and the winner is reopened at the end.
+    tried = []
+    best_report = None
+    for backend_name, backend in camera_backends():
+        for pixel_format in formats:
+            cap = cv2.VideoCapture(index, backend)
+            if not cap.isOpened():
+                cap.release()
+                tried.append(f"{backend_name}: could not open")
+                break
+            configure_camera(cap, pixel_format, width, height, fps)
+            report = {
+                "backend": backend_name,
+                "backend_id": backend,
+                "requested_format": pixel_format,
+                "format": fourcc_to_str(cap.get(cv2.CAP_PROP_FOURCC)),
+                "requested_size": (width, height),
+                "size": (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))),
+                "requested_fps": fps,
+                "reported_fps": cap.get(cv2.CAP_PROP_FPS),
+                "measured_fps": measure_fps(cap, probe_frames),
+            }
+            cap.release()
+            tried.append(f"{backend_name}/{pixel_format}: {report['format'] or '?'} "
+                         f"{report['size'][0]}x{report['size'][1]} @ {report['measured_fps']:.1f} fps")
+            if best_report is None or report["measured_fps"] > best_report["measured_fps"]:
+                best_report = report
+            if best_report["measured_fps"] >= fps * 0.9:
+                break
+        if best_report is not None and best_report["measured_fps"] >= fps * 0.9:
+            break
+    if best_report is None:
+        return None, {"tried": tried}
+    best_report["tried"] = tried
+    cap = cv2.VideoCapture(index, best_report["backend_id"])
+    if not cap.isOpened():
+        cap.release()
+        tried.append(f"{best_report['backend']}/{best_report['requested_format']}: could not reopen")
+        return None, {"tried": tried}
+    configure_camera(cap, best_report["requested_format"], width, height, fps)
+    return cap, best_report
+
+
+def format_camera_report(report):
+    if "backend" not in report:
+        return "Camera: no usable device (" + "; ".join(report["tried"]) + ")"
+    lines = [
+        f"Camera: {report['backend']} {report['format'] or report['requested_format']} "
+        f"{report['size'][0]}x{report['size'][1]} @ {report['measured_fps']:.1f} fps measured "
+        f"({report['reported_fps']:.1f} reported, {report['requested_fps']} requested)",
+    ]
+    if report["size"] != report["requested_size"]:
+        lines.append(f"  Warning: requested {report['requested_size'][0]}x{report['requested_size'][1]}")
+    if report["measured_fps"] < report["requested_fps"] * 0.9:
+        lines.append("  Warning: target frame rate not reached")
+    lines.extend("  Tried " + entry for entry in report["tried"])
+    return "\n".join(lines)
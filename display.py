@@ -0,0 +1,254 @@
+import os
+import time
+import tkinter as tk
+from functools import lru_cache
+import numpy as np
+import cv2
+
+DISPLAY_ENV = "AERICAM_DISPLAY"
+
+
+class DisplaySurface:
+    # One Tk photo image per display size, updated in place every frame instead of
+    # allocating a new ImageTk.PhotoImage (and its Tcl-side image) per tick.
+    # Frames arrive in BGR; the display surfaces are the one place they become RGB.
+    def __init__(self):
+        # Pillow is slow to import, so only the backend that uses it loads it
+        from PIL import Image, ImageTk
+        self.Image = Image
+        self.ImageTk = ImageTk
+        self.photo = None
+        self.size = None
+        self.rgb = None
+
+    def update(self, frame):
+        # Returns True when a new image was allocated and has to be attached to the widget
+        height, width = frame.shape[:2]
+        if self.rgb is None or self.rgb.shape != frame.shape:
+            self.rgb = np.empty_like(frame)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        image = self.Image.fromarray(self.rgb)
+        if self.photo is not None and self.size == (width, height):
+            self.photo.paste(image)
+            return False
+        self.photo = self.ImageTk.PhotoImage(image=image)
+        self.size = (width, height)
+        return True
+
+
+class PPMDisplaySurface:
+    # Same interface as DisplaySurface, but hands the frame to Tk as binary PPM data
+    # instead of going through Image.fromarray and ImageTk. The BGR frame is converted
+    # straight into the pixel area of a preallocated PPM buffer; _tkinter only passes
+    # bytes objects to Tcl, so that buffer is copied once on the way in.
+    def __init__(self):
+        self.photo = None
+        self.size = None
+        self.buffer = None
+        self.rgb = None
+
+    def update(self, frame):
+        height, width = frame.shape[:2]
+        allocated = False
+        if self.photo is None or self.size != (width, height):
+            header = f"P6 {width} {height} 255\n".encode("ascii")
+            self.buffer = bytearray(len(header) + width * height * 3)
+            self.buffer[:len(header)] = header
+            self.rgb = np.frombuffer(self.buffer, np.uint8, offset=len(header)).reshape(height, width, 3)
+            self.photo = tk.PhotoImage(width=width, height=height)
+            self.size = (width, height)
+            allocated = True
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        self.photo.tk.call(self.photo.name, "put", bytes(self.buffer), "-format", "ppm")
+        return allocated
+
+
+def open_display_surface(backend=None):
+    # AERICAM_DISPLAY selects the backend: "pil" (default) or "ppm"
+    backend = (backend or os.environ.get(DISPLAY_ENV, "pil")).lower()
+    if backend == "ppm":
+        return PPMDisplaySurface()
+    if backend != "pil":
+        print(f"Unknown display backend {backend!r}, using pil.")
+    return DisplaySurface()
+
+
+class ScalingPlan:
+    # Everything the preview needs to scale a frame, worked out once per size change
+    def __init__(self, source_size, target_size, letterbox=False):
+        source_width, source_height = source_size
+        target_width, target_height = target_size
+        width, height = target_width, target_height
+        if letterbox:
+            aspect_ratio = source_width / source_height
+            if target_width / target_height > aspect_ratio:
+                width = int(target_height * aspect_ratio)
+            else:
+                height = int(target_width / aspect_ratio)
+        self.size = (max(1, width), max(1, height))
+        self.offset = ((target_width - self.size[0]) // 2, (target_height - self.size[1]) // 2)
+        self.skip = self.size == (source_width, source_height)
+        downscale = self.size[0] * self.size[1] < source_width * source_height
+        self.interpolation = cv2.INTER_AREA if downscale else cv2.INTER_LINEAR
+
+
+@lru_cache(maxsize=16)
+def scaling_plan(source_size, target_size, letterbox=False):
+    return ScalingPlan(source_size, target_size, letterbox)
+
+
+class ZoomView:
+    # Digital zoom and pan as a crop of the source frame. The crop is a NumPy view, so
+    # the resize that follows reads fewer pixels the further in it is zoomed instead of
+    # adding a pass. Positions are fractions of the frame so they survive size changes,
+    # and the state is one tuple so a recorder thread always reads a consistent view.
+    def __init__(self, max_zoom=8.0, step=1.25):
+        self.max_zoom = max_zoom
+        self.step = step
+        self.state = (1.0, 0.5, 0.5)  # zoom, view centre x, view centre y
+
+    @property
+    def zoomed(self):
+        return self.state[0] > 1.0
+
+    def set(self, zoom, centre_x, centre_y):
+        zoom = min(max(zoom, 1.0), self.max_zoom)
+        half = 0.5 / zoom
+        self.state = (zoom, min(max(centre_x, half), 1 - half), min(max(centre_y, half), 1 - half))
+
+    def zoom_at(self, factor, view_x=0.5, view_y=0.5):
+        # Keeps the point at (view_x, view_y) of the current view where it is on screen
+        zoom, centre_x, centre_y = self.state
+        new_zoom = min(max(zoom * factor, 1.0), self.max_zoom)
+        frame_x = centre_x + (view_x - 0.5) / zoom
+        frame_y = centre_y + (view_y - 0.5) / zoom
+        self.set(new_zoom, frame_x - (view_x - 0.5) / new_zoom, frame_y - (view_y - 0.5) / new_zoom)
+
+    def pan(self, dx, dy):
+        # dx and dy are fractions of the current view
+        zoom, centre_x, centre_y = self.state
+        self.set(zoom, centre_x + dx / zoom, centre_y + dy / zoom)
+
+    def reset(self):
+        self.state = (1.0, 0.5, 0.5)
+
+    def rect(self, width, height):
+        zoom, centre_x, centre_y = self.state
+        crop_width, crop_height = max(1, round(width / zoom)), max(1, round(height / zoom))
+        x = min(max(0, round(centre_x * width - crop_width / 2)), width - crop_width)
+        y = min(max(0, round(centre_y * height - crop_height / 2)), height - crop_height)
+        return x, y, crop_width, crop_height
+
+    def crop(self, image):
+        if not self.zoomed:
+            return image
+        x, y, width, height = self.rect(image.shape[1], image.shape[0])
+        return image[y:y + height, x:x + width]
+
+
+def bind_zoom_controls(window, preview, zoom, image_rect):
+    # +/- or the mouse wheel zoom, the arrow keys pan and 0 resets. The wheel zooms
+    # around the cursor; image_rect() returns where the preview image sits in the
+    # preview widget as (x, y, width, height), or None before the first frame.
+    def on_wheel(event):
+        rect = image_rect()
+        if rect is None:
+            return
+        x, y, width, height = rect
+        factor = zoom.step if event.num == 4 or event.delta > 0 else 1 / zoom.step
+        zoom.zoom_at(factor, min(max((event.x - x) / width, 0.0), 1.0), min(max((event.y - y) / height, 0.0), 1.0))
+
+    for sequence in ("<plus>", "<equal>", "<KP_Add>"):
+        window.bind(sequence, lambda e: zoom.zoom_at(zoom.step))
+    for sequence in ("<minus>", "<KP_Subtract>"):
+        window.bind(sequence, lambda e: zoom.zoom_at(1 / zoom.step))
+    window.bind("0", lambda e: zoom.reset())
+    window.bind("<Left>", lambda e: zoom.pan(-0.1, 0))
+    window.bind("<Right>", lambda e: zoom.pan(0.1, 0))
+    window.bind("<Up>", lambda e: zoom.pan(0, -0.1))
+    window.bind("<Down>", lambda e: zoom.pan(0, 0.1))
+    # Windows and macOS send <MouseWheel>, X11 sends buttons 4 and 5
+    for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+        preview.bind(sequence, on_wheel)
+
+
+class GeometryTracker:
+    # Follows <Configure> events instead of polling winfo_width/height every tick.
+    # While the window is being dragged the new size is only taken once it has
+    # been stable for `settle` seconds, so the pipeline doesn't rebuild per event.
+    def __init__(self, widget, initial=(1, 1), settle=0.1):
+        self.widget = widget
+        self.size = initial
+        self.settle = settle
+        self.pending = None
+        self.changed_at = 0.0
+        widget.bind("<Configure>", self.on_configure, add="+")
+
+    def on_configure(self, event):
+        if event.widget is not self.widget:
+            return
+        size = (max(1, event.width), max(1, event.height))
+        if size == self.size:
+            self.pending = None
+            return
+        if self.size[0] <= 1 or self.size[1] <= 1:
+            # First real size after the window is mapped
+            self.size = size
+            return
+        self.pending = size
+        self.changed_at = time.monotonic()
+
+    def current(self):
+        if self.pending is not None and time.monotonic() - self.changed_at >= self.settle:
+            self.size = self.pending
+            self.pending = None
+        return self.size
+
+
+class VisibilityTracker:
+    # Follows <Map>, <Unmap> and <Visibility> so the preview can stop rendering while
+    # the window is minimised or fully covered, and notes the last mouse or keyboard
+    # input so an unattended window can be told apart from one being watched
+    def __init__(self, widget, on_change=None):
+        self.widget = widget
+        self.on_change = on_change
+        self.mapped = True
+        self.obscured = False
+        self.last_input = time.monotonic()
+        widget.bind("<Map>", self.on_map, add="+")
+        widget.bind("<Unmap>", self.on_unmap, add="+")
+        widget.bind("<Visibility>", self.on_visibility, add="+")
+        # On the "all" bindtag, so key-specific bindings on the window do not shadow <KeyPress>
+        for sequence in ("<Motion>", "<KeyPress>", "<ButtonPress>", "<MouseWheel>"):
+            widget.bind_all(sequence, self.on_input, add="+")
+
+    @property
+    def visible(self):
+        return self.mapped and not self.obscured
+
+    def on_map(self, event):
+        if event.widget is self.widget:
+            self.set(mapped=True)
+
+    def on_unmap(self, event):
+        if event.widget is self.widget:
+            self.set(mapped=False)
+
+    def on_visibility(self, event):
+        if event.widget is self.widget:
+            self.set(obscured=event.state == "VisibilityFullyObscured")
+
+    def on_input(self, event):
+        self.last_input = time.monotonic()
+
+    def idle_for(self):
+        return time.monotonic() - self.last_input
+
+    def set(self, mapped=None, obscured=None):
+        was_visible = self.visible
+        if mapped is not None:
+            self.mapped = mapped
+        if obscured is not None:
+            self.obscured = obscured
+        if self.visible != was_visible and self.on_change is not None:
+            self.on_change(self.visible)
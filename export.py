@@ -0,0 +1,142 @@
+import argparse
+import datetime
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from layout import load_overlay_layout
+from telemetry import read_telemetry
+
+
+def overlay_values(row, session=None):
+    # The values draw_overlay() used live, rebuilt from one sidecar row
+    roll = row["roll"]
+    angle = float(row["angle"]) if row["angle"] else math.radians((90 - float(roll)) % 360)
+    return {"angle": angle, "roll": roll, "now": datetime.datetime.fromisoformat(row["wall_time"]),
+            "time": float(row["timestamp"]), "session": row["session"] if session is None else session,
+            "timer": row["timer"]}
+
+
+def burn_chunk(video_path, rows, start, output_path, fourcc, layout_path, session):
+    # Runs in a worker process: seeks to its first frame and burns the overlay into its share
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 20.0
+    layout = load_overlay_layout(layout_path)
+    writer = None
+    written = 0
+    for row in rows:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if writer is None:
+            writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, (frame.shape[1], frame.shape[0]))
+        layout.draw(frame, overlay_values(row, session))
+        writer.write(frame)
+        written += 1
+    if writer is not None:
+        writer.release()
+    cap.release()
+    return written
+
+
+def concat_chunks(chunk_paths, output_path, ffmpeg):
+    # ffmpeg's concat demuxer with stream copy: the chunks are joined without decoding
+    list_path = os.path.join(os.path.dirname(chunk_paths[0]), "chunks.txt")
+    with open(list_path, "w") as f:
+        for chunk_path in chunk_paths:
+            f.write(f"file '{os.path.abspath(chunk_path)}'\n")
+    result = subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path,
+                             "-c", "copy", output_path], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"Error: ffmpeg could not join the chunks: {result.stderr.strip()}")
+        return False
+    return True
+
+
+def transcode_chunks(chunk_paths, output_path, fps, fourcc):
+    # Without ffmpeg the lossless chunks are encoded once, in order, into the output
+    out = None
+    for chunk_path in chunk_paths:
+        chunk = cv2.VideoCapture(chunk_path)
+        while True:
+            ret, frame = chunk.read()
+            if not ret:
+                break
+            if out is None:
+                out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, (frame.shape[1], frame.shape[0]))
+            out.write(frame)
+        chunk.release()
+    if out is not None:
+        out.release()
+    return True
+
+
+def export_video(video_path, telemetry_path, output_path, workers=None, layout_path=None, session=None, fourcc="XVID",
+                 ffmpeg=None):
+    # With ffmpeg the workers encode straight to the output codec and the chunks are
+    # stream-copied together, so the only serial step is the concatenation. Without it
+    # the workers write lossless FFV1 chunks, so there is still one lossy generation,
+    # but the final encode runs on one process.
+    rows = read_telemetry(telemetry_path)
+    if not rows:
+        print(f"Error: {telemetry_path} has no frames.")
+        return False
+    ffmpeg = ffmpeg or shutil.which("ffmpeg")
+    if ffmpeg is None:
+        print("ffmpeg not found, the chunks are joined by re-encoding them once (install ffmpeg for a stream copy).")
+    chunk_fourcc = fourcc if ffmpeg else "FFV1"
+    workers = workers or os.cpu_count() or 1
+    chunk_size = math.ceil(len(rows) / workers)
+    chunk_dir = tempfile.mkdtemp(prefix="aericam_export_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        chunks = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for start in range(0, len(rows), chunk_size):
+                chunk_path = os.path.join(chunk_dir, f"chunk_{start:08d}.avi")
+                future = pool.submit(burn_chunk, video_path, rows[start:start + chunk_size], start, chunk_path,
+                                     chunk_fourcc, layout_path, session)
+                chunks.append((chunk_path, future))
+            counts = [future.result() for _, future in chunks]
+        chunk_paths = [chunk_path for chunk_path, _ in chunks]
+        if ffmpeg:
+            joined = concat_chunks(chunk_paths, output_path, ffmpeg)
+        else:
+            source = cv2.VideoCapture(video_path)
+            fps = source.get(cv2.CAP_PROP_FPS) or 20.0
+            source.release()
+            joined = transcode_chunks(chunk_paths, output_path, fps, fourcc)
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+    if not joined:
+        return False
+    written = sum(counts)
+    if written != len(rows):
+        print(f"Warning: {len(rows)} telemetry rows but {written} frames were read from {video_path}.")
+    print(f"Exported {written} frames with {len(chunks)} chunks on {workers} workers to {output_path}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Burn the AeriCam overlay into a clean recording")
+    parser.add_argument("video", help="clean recording made with AERICAM_CLEAN_RECORDING=1")
+    parser.add_argument("--telemetry", help="sidecar CSV (default: next to the video)")
+    parser.add_argument("--output", help="output video (default: <video>_overlay.avi)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--layout", help="config.json with the overlay layout to render (default: the app's)")
+    parser.add_argument("--session", help="session name to show instead of the one logged")
+    parser.add_argument("--fourcc", default="XVID")
+    parser.add_argument("--ffmpeg", help="ffmpeg executable used to join the chunks (default: ffmpeg on PATH)")
+    args = parser.parse_args()
+
+    base = os.path.splitext(args.video)[0]
+    telemetry_path = args.telemetry or base + ".csv"
+    if not os.path.exists(telemetry_path):
+        print(f"Error: no telemetry sidecar at {telemetry_path}.")
+        raise SystemExit(1)
+    if not export_video(args.video, telemetry_path, args.output or base + "_overlay.avi", args.workers,
+                        args.layout, args.session, args.fourcc, args.ffmpeg):
+        raise SystemExit(1)
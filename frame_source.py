@@ -0,0 +1,209 @@
+import os
+import time
+import numpy as np
+import cv2
+from capture import configure_camera, open_camera
+
+# Set AERICAM_SOURCE to a camera index, a video file (optionally "path@fps")
+# or "synthetic[:WIDTHxHEIGHT[@FPS]]" to run without a webcam
+SOURCE_ENV = "AERICAM_SOURCE"
+
+
+class ReadPacer:
+    def __init__(self, fps):
+        self.interval = 1.0 / fps if fps else 0.0
+        self.next_time = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_time is None or now - self.next_time > self.interval:
+            # First read, or the consumer fell behind: restart the schedule instead of bursting
+            self.next_time = now
+        elif self.next_time > now:
+            time.sleep(self.next_time - now)
+        self.next_time += self.interval
+
+
+class CameraSource:
+    def __init__(self, index=0, width=None, height=None, fps=None, report=None):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.fps = fps
+        if report is not None and "backend_id" in report:
+            # Reuse an earlier negotiation so a reconnect skips the probing
+            self.cap = cv2.VideoCapture(index, report["backend_id"])
+            if self.cap.isOpened():
+                configure_camera(self.cap, report["requested_format"], width, height, fps or 30)
+            self.report = report
+        elif width is None:
+            self.cap = cv2.VideoCapture(index)
+            self.report = None
+        else:
+            self.cap, self.report = open_camera(index, width, height, fps or 30)
+
+    def reopen(self):
+        return CameraSource(self.index, self.width, self.height, self.fps, self.report)
+
+    def read(self, image=None):
+        if self.cap is None:
+            return False, None
+        return self.cap.read(image=image)
+
+    def get(self, prop):
+        if self.cap is None:
+            return 0.0
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap is not None and self.cap.set(prop, value)
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class FileSource:
+    # Replays recorded footage at its native rate, a forced rate, or as fast as possible (fps=0)
+    def __init__(self, path, fps=None, loop=True):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        self.loop = loop
+        native_fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.fps = native_fps if fps is None else fps
+        self.pacer = ReadPacer(self.fps)
+        self.report = {
+            "backend": "file",
+            "requested_format": "file",
+            "format": os.path.basename(path),
+            "requested_size": self.size(),
+            "size": self.size(),
+            "requested_fps": self.fps,
+            "reported_fps": native_fps,
+            "measured_fps": self.fps,
+            "tried": [],
+        }
+
+    def reopen(self):
+        return FileSource(self.path, self.fps, self.loop)
+
+    def size(self):
+        return int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def read(self, image=None):
+        self.pacer.wait()
+        ret, frame = self.cap.read(image=image)
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(image=image)
+        return ret, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return False
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.cap.release()
+
+
+class SyntheticSource:
+    # Moving test pattern for benchmarking the pipeline headless
+    def __init__(self, width=1280, height=720, fps=30, pattern="bars"):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pacer = ReadPacer(fps)
+        self.pattern = self.build_pattern(pattern)
+        self.frame_index = 0
+        self.opened = True
+        self.report = {
+            "backend": "synthetic",
+            "requested_format": pattern,
+            "format": pattern,
+            "requested_size": (width, height),
+            "size": (width, height),
+            "requested_fps": fps,
+            "reported_fps": float(fps),
+            "measured_fps": float(fps),
+            "tried": [],
+        }
+
+    def reopen(self):
+        return SyntheticSource(self.width, self.height, self.fps, self.report["format"])
+
+    def build_pattern(self, pattern):
+        # Twice the frame width so each frame is a scrolling view into it
+        x = np.arange(self.width * 2)
+        if pattern == "checker":
+            y = np.arange(self.height)[:, None]
+            cells = (((x[None, :] // 40 + y // 40) % 2) * 255).astype(np.uint8)
+            return np.repeat(cells[:, :, None], 3, axis=2)
+        bars = np.array([[255, 255, 255], [0, 255, 255], [255, 255, 0], [0, 255, 0],
+                         [255, 0, 255], [0, 0, 255], [255, 0, 0], [0, 0, 0]], np.uint8)
+        row = bars[(x * 8 // self.width) % 8]
+        shade = np.linspace(0.4, 1.0, self.height)[:, None, None]
+        return (row[None, :, :] * shade).astype(np.uint8)
+
+    def read(self, image=None):
+        if not self.opened:
+            return False, None
+        self.pacer.wait()
+        offset = (self.frame_index * 8) % self.width
+        self.frame_index += 1
+        view = self.pattern[:, offset:offset + self.width]
+        if image is None or image.shape != view.shape:
+            image = np.empty(view.shape, np.uint8)
+        np.copyto(image, view)
+        return True, image
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        return 0.0
+
+    def set(self, prop, value):
+        return False
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        self.opened = False
+
+
+def open_source(spec=None, width=None, height=None, fps=None):
+    if spec is None:
+        spec = os.environ.get(SOURCE_ENV, "0")
+    spec = str(spec)
+    if spec.isdigit():
+        return CameraSource(int(spec), width, height, fps)
+    if spec.startswith("synthetic"):
+        width, height, fps = width or 1280, height or 720, fps or 30
+        options = spec.partition(":")[2]
+        if options:
+            size, _, rate = options.partition("@")
+            if size:
+                width, height = (int(value) for value in size.lower().split("x"))
+            if rate:
+                fps = float(rate)
+        return SyntheticSource(width, height, fps)
+    path, _, rate = spec.rpartition("@")
+    if path and rate.replace(".", "", 1).isdigit():
+        return FileSource(path, float(rate))
+    return FileSource(spec)
@@ -0,0 +1,166 @@
+import json
+import os
+import string
+from collections import OrderedDict
+import cv2
+from overlay import OVERLAY_COLOURS_RGB, TextCache, radar_sprite, text_size
+
+FONTS = {
+    "simplex": cv2.FONT_HERSHEY_SIMPLEX,
+    "plain": cv2.FONT_HERSHEY_PLAIN,
+    "duplex": cv2.FONT_HERSHEY_DUPLEX,
+    "complex": cv2.FONT_HERSHEY_COMPLEX,
+    "triplex": cv2.FONT_HERSHEY_TRIPLEX,
+}
+
+# Used when config.json has no "overlay" section. Offsets, margins, font scales and
+# thicknesses are in pixels at reference_height and scale with the frame height, so at
+# 720p this draws exactly what add_overlay_text() and draw_radar() used to.
+DEFAULT_OVERLAY_LAYOUT = {
+    "reference_height": 720,
+    "widgets": [
+        {"type": "radar", "anchor": "top_right", "radius": 0.125, "margin": 20, "thickness": 2,
+         "colour": "radar_needle"},
+        {"type": "text", "text": "Rotation Roll: {roll}", "anchor": "top_right", "offset": [-300, 230],
+         "font": "simplex", "scale": 0.8, "thickness": 2, "colour": "roll_text", "rate": 10},
+        {"type": "text", "text": "{now:%d/%m/%Y - %H:%M:%S}", "anchor": "bottom_right", "offset": [-10, -10],
+         "align": "right", "font": "simplex", "scale": 0.8, "thickness": 2, "colour": "date_text"},
+        {"type": "text", "text": "Session: {session}", "anchor": "top_right", "offset": [-200, 30],
+         "font": "simplex", "scale": 1.0, "thickness": 2, "colour": "session_text"},
+        {"type": "text", "text": "{timer}", "anchor": "top_center", "offset": [-50, 30],
+         "font": "simplex", "scale": 0.8, "thickness": 2, "colour": "timer_text"},
+    ],
+}
+
+
+def anchor_point(anchor, width, height):
+    vertical, _, horizontal = anchor.partition("_")
+    if anchor == "center":
+        vertical, horizontal = "center", "center"
+    x = {"left": 0, "center": width // 2, "right": width}[horizontal]
+    y = {"top": 0, "center": height // 2, "bottom": height}[vertical]
+    return x, y
+
+
+def layout_colour(value, order):
+    # A name from OVERLAY_COLOURS_RGB or an [r, g, b] list
+    rgb = OVERLAY_COLOURS_RGB[value] if isinstance(value, str) else tuple(value)
+    return tuple(rgb[::-1]) if order == "BGR" else tuple(rgb)
+
+
+class RadarOp:
+    def __init__(self, sprite, colour, thickness):
+        self.sprite = sprite
+        self.colour = colour
+        self.thickness = thickness
+
+    def draw(self, frame, values, text_cache, line_type):
+        # The needle goes under the ring and crosshair, as before
+        cv2.line(frame, self.sprite.center, self.sprite.needle_end(values["angle"]), self.colour, self.thickness)
+        self.sprite.blend(frame)
+
+
+class TextOp:
+    def __init__(self, template, org, align, font, scale, colour, thickness, rate):
+        self.template = template
+        # Widgets whose fields are empty (no session name, not recording) are skipped
+        self.fields = [name.split(".")[0].split("[")[0]
+                       for _, name, _, _ in string.Formatter().parse(template) if name]
+        self.org = org
+        self.align = align
+        self.font = font
+        self.scale = scale
+        self.colour = colour
+        self.thickness = thickness
+        self.interval = 1.0 / rate if rate else 0.0
+        self.last_time = None
+        self.last_text = None
+
+    def text(self, values):
+        # A rate limits how often a fast-changing value (the roll) is re-rendered
+        now = values.get("time")
+        if self.interval and self.last_time is not None and now is not None and 0 <= now - self.last_time < self.interval:
+            return self.last_text
+        self.last_time = now
+        self.last_text = self.template.format(**values)
+        return self.last_text
+
+    def draw(self, frame, values, text_cache, line_type):
+        for field in self.fields:
+            if values.get(field) in (None, ""):
+                return
+        text = self.text(values)
+        x, y = self.org
+        if self.align != "left":
+            (text_width, _), _ = text_size(text, self.font, self.scale, self.thickness)
+            x -= text_width if self.align == "right" else text_width // 2
+        text_cache.put_text(frame, text, (x, y), self.font, self.scale, self.colour, self.thickness, line_type)
+
+
+class OverlayLayout:
+    # The overlay described as data: widgets with anchors, offsets, sizes, fonts,
+    # colours and update rates. compile() turns it into a flat list of draw operations
+    # with every position and size already worked out for one frame size, so drawing
+    # a frame is a loop over cached ops.
+    def __init__(self, spec, order="BGR", max_sizes=8):
+        self.spec = spec
+        self.order = order
+        self.reference_height = spec.get("reference_height", 720)
+        self.max_sizes = max_sizes
+        self.compiled = OrderedDict()
+        self.text_cache = TextCache()
+
+    def compile(self, width, height):
+        ops = self.compiled.get((width, height))
+        if ops is not None:
+            self.compiled.move_to_end((width, height))
+            return ops
+        scale = height / self.reference_height
+        ops = []
+        for widget in self.spec["widgets"]:
+            kind = widget.get("type", "text")
+            if kind == "radar":
+                ops.append(self.compile_radar(widget, width, height, scale))
+            elif kind == "text":
+                ops.append(self.compile_text(widget, width, height, scale))
+            else:
+                raise ValueError(f"Unknown overlay widget type {kind!r}")
+        self.compiled[(width, height)] = ops
+        while len(self.compiled) > self.max_sizes:
+            self.compiled.popitem(last=False)
+        return ops
+
+    def compile_radar(self, widget, width, height, scale):
+        radius = int(min(width, height) * widget.get("radius", 0.125))
+        margin = round(widget.get("margin", 20) * scale)
+        x, y = anchor_point(widget.get("anchor", "top_right"), width, height)
+        # The anchor is the corner of the radar's bounding box
+        x += margin + radius if x < width // 2 else (-margin - radius if x > width // 2 else 0)
+        y += margin + radius if y < height // 2 else (-margin - radius if y > height // 2 else 0)
+        sprite = radar_sprite(width, height, self.order, center=(x, y), radius=radius)
+        thickness = max(1, round(widget.get("thickness", 2) * scale))
+        return RadarOp(sprite, layout_colour(widget.get("colour", "radar_needle"), self.order), thickness)
+
+    def compile_text(self, widget, width, height, scale):
+        x, y = anchor_point(widget.get("anchor", "top_left"), width, height)
+        offset_x, offset_y = widget.get("offset", [0, 0])
+        org = (x + round(offset_x * scale), y + round(offset_y * scale))
+        return TextOp(widget["text"], org, widget.get("align", "left"), FONTS[widget.get("font", "simplex")],
+                      widget.get("scale", 1.0) * scale, layout_colour(widget.get("colour", "date_text"), self.order),
+                      max(1, round(widget.get("thickness", 1) * scale)), widget.get("rate"))
+
+    def draw(self, frame, values, line_type=cv2.LINE_AA):
+        for op in self.compile(frame.shape[1], frame.shape[0]):
+            op.draw(frame, values, self.text_cache, line_type)
+
+
+def load_overlay_layout(path=None, order="BGR"):
+    # The "overlay" section of config.json, next to the button icon paths
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+    spec = DEFAULT_OVERLAY_LAYOUT
+    try:
+        with open(path) as f:
+            spec = json.load(f).get("overlay", DEFAULT_OVERLAY_LAYOUT)
+    except FileNotFoundError:
+        print(f"{path} not found, using the default overlay layout.")
+    return OverlayLayout(spec, order)
@@ -3,6 +3,8 @@ import os
 import datetime
 import math
 import serial
+from frame_source import open_source
+from overlay import TextCache, overlay_colours, radar_sprite
 from kivy.app import App
 from kivy.uix.widget import Widget
 from kivy.graphics.texture import Texture
@@ -12,17 +14,17 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.clock import Clock
 from kivy.core.window import Window
 
+# Same colours as the Tk app's overlay
+OVERLAY_COLOURS = overlay_colours("BGR")
+
 
 class AeriCamApp(App):
     def build(self):
-        self.capture = cv2.VideoCapture(0)
+        self.capture = open_source(None, 1280, 720, fps=30)
         if not self.capture.isOpened():
             print("Error: Could not open webcam.")
             exit()
 
-        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-
         # Set up serial connection to Arduino
         self.serial_conn = serial.Serial('COM3', 9600)
 
@@ -34,6 +36,8 @@ class AeriCamApp(App):
         self.recording_start_time = None
         self.pause_start_time = None
         self.total_pause_duration = datetime.timedelta()
+        self.texture = None
+        self.text_cache = TextCache()
 
         # Set up layout
         self.root = BoxLayout(orientation='vertical')
@@ -85,8 +89,8 @@ class AeriCamApp(App):
             # Display the current date and time
             now = datetime.datetime.now()
             date_time_str = now.strftime("%d/%m/%Y - %H:%M:%S")
-            cv2.putText(frame, date_time_str, (frame.shape[1] - 360, frame.shape[0] - 20),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+            self.text_cache.put_text(frame, date_time_str, (frame.shape[1] - 360, frame.shape[0] - 20),
+                                     cv2.FONT_HERSHEY_SIMPLEX, 0.8, OVERLAY_COLOURS["date_text"], 2, cv2.LINE_AA)
 
             # Timer logic
             if self.recording:
@@ -97,20 +101,31 @@ class AeriCamApp(App):
                 minutes, seconds = divmod(int(elapsed_time.total_seconds()), 60)
                 hours, minutes = divmod(minutes, 60)
                 timer_text = f"{hours:02}:{minutes:02}:{seconds:02}"
-                cv2.putText(frame, timer_text, (frame.shape[1] // 2 - 50, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2, cv2.LINE_AA)  # Timer in red
+                self.text_cache.put_text(frame, timer_text, (frame.shape[1] // 2 - 50, 30),
+                                         cv2.FONT_HERSHEY_SIMPLEX, 0.8, OVERLAY_COLOURS["timer_text"], 2, cv2.LINE_AA)
 
                 if not self.paused:
                     # Write frame to video output without color conversion
                     self.out.write(frame)
 
-            buf = cv2.flip(frame, 0).tobytes()
-            texture = Texture.create(size=(frame.shape[1], frame.shape[0]), colorfmt='bgr')
-            texture.blit_buffer(buf, colorfmt='bgr', bufferfmt='ubyte')
-            self.image.texture = texture
+            self.show_frame(frame)
+
+    def show_frame(self, frame):
+        size = (frame.shape[1], frame.shape[0])
+        if self.texture is None or self.texture.size != size:
+            # Allocated once per resolution, the vertical flip is done with texture coordinates
+            self.texture = Texture.create(size=size, colorfmt='bgr')
+            self.texture.flip_vertical()
+            self.image.texture = self.texture
+        # Upload straight from the frame's buffer, no flipped copy or tobytes(). blit_buffer
+        # takes a flat buffer, and reshape(-1) of a contiguous frame is a view, not a copy
+        self.texture.blit_buffer(frame.reshape(-1), colorfmt='bgr', bufferfmt='ubyte')
+        self.image.canvas.ask_update()
 
     def draw_radar(self, frame, roll_value):
-        min_radius = min(frame.shape[1], frame.shape[0]) // 8
+        # The ring, crosshair and needle end points come from a sprite cached per frame size
+        sprite = radar_sprite(frame.shape[1], frame.shape[0])
+        min_radius = sprite.radius
 
         # Calculate the radar angle
         target_angle = (90 - float(roll_value)) % 360
@@ -124,16 +139,12 @@ class AeriCamApp(App):
         self.last_angle %= 360
 
         angle_rad = math.radians(self.last_angle)
-        center = (frame.shape[1] - min_radius - 20, min_radius + 20)
-        radar_x = int(center[0] + min_radius * math.cos(angle_rad))
-        radar_y = int(center[1] - min_radius * math.sin(angle_rad))
-        cv2.line(frame, center, (radar_x, radar_y), (0, 0, 255), 2)  # Radar hand in red
-        cv2.circle(frame, center, min_radius, (255, 255, 255), 2)
-        cv2.line(frame, (center[0], center[1] - min_radius), (center[0], center[1] + min_radius), (255, 255, 255), 1)
-        cv2.line(frame, (center[0] - min_radius, center[1]), (center[0] + min_radius, center[1]), (255, 255, 255), 1)
+        center = sprite.center
+        cv2.line(frame, center, sprite.needle_end(angle_rad), OVERLAY_COLOURS["radar_needle"], 2)
+        sprite.blend(frame)
 
-        cv2.putText(frame, f"Rotation Roll: {roll_value}", (center[0] - min_radius - 100, min_radius * 2 + 50),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+        self.text_cache.put_text(frame, f"Rotation Roll: {roll_value}", (center[0] - min_radius - 100, min_radius * 2 + 50),
+                                 cv2.FONT_HERSHEY_SIMPLEX, 0.8, OVERLAY_COLOURS["roll_text"], 2, cv2.LINE_AA)
 
     def capture_photo(self, frame, roll_value):
         # Draw the radar on the frame
@@ -141,8 +152,8 @@ class AeriCamApp(App):
 
         now = datetime.datetime.now()
         date_time_str = now.strftime("%d/%m/%Y - %H:%M:%S")
-        cv2.putText(frame, date_time_str, (frame.shape[1] - 360, frame.shape[0] - 20),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+        self.text_cache.put_text(frame, date_time_str, (frame.shape[1] - 360, frame.shape[0] - 20),
+                                 cv2.FONT_HERSHEY_SIMPLEX, 0.8, OVERLAY_COLOURS["date_text"], 2, cv2.LINE_AA)
 
         timestamp = now.strftime("%Y%m%d_%H%M%S")
         photo_path = os.path.join('Gallery', f'captured_image_{timestamp}.jpg')
@@ -0,0 +1,144 @@
+import math
+import threading
+import numpy as np
+import cv2
+from capture import CaptureThread, CaptureWatchdog, FrameBus, FrameStats
+from telemetry import TelemetryLog
+from display import scaling_plan
+
+
+class CameraFeed:
+    # One device with its own capture thread, latest-frame buffer, stats and recorder.
+    # The preview reads the latest-frame slot; the recorder gets every frame through its
+    # own bus subscriber and thread, so each stream is recorded at its own rate.
+    def __init__(self, index, source, pool=None, roll_source=None, placeholder_size=(1280, 720)):
+        self.index = index
+        self.bus = FrameBus()
+        self.grabber = CaptureThread(source, bus=self.bus, pool=pool, roll_source=roll_source)
+        self.watchdog = CaptureWatchdog(self.grabber, placeholder_size=placeholder_size)
+        self.stats = FrameStats()
+        self.writer = None
+        self.telemetry = None
+        self.render = None
+        self.record_frames = None
+        self.recording_thread = None
+        self.recorder_stopping = False
+        self.paused = False
+        self.written = 0
+
+    def start(self):
+        self.grabber.start()
+        self.watchdog.start()
+        return self
+
+    def size(self):
+        return int(self.grabber.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.grabber.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def fps(self):
+        # The rate measured when the camera was negotiated, else what the device reports
+        report = getattr(self.grabber.cap, "report", None)
+        measured = report.get("measured_fps") if report else None
+        return measured or self.grabber.cap.get(cv2.CAP_PROP_FPS) or 20.0
+
+    def start_recording(self, path, fourcc, render=None, telemetry_path=None):
+        # render(frame, telemetry) runs on the recorder thread and returns the image to
+        # write, drawing the overlay or logging to the telemetry sidecar as it needs
+        fps = self.fps()
+        self.writer = cv2.VideoWriter(path, fourcc, fps, self.size())
+        if telemetry_path is not None:
+            self.telemetry = TelemetryLog(telemetry_path)
+        self.render = render
+        self.paused = False
+        self.written = 0
+        self.recorder_stopping = False
+        self.record_frames = self.bus.subscribe(maxsize=int(fps * 4), drop="oldest")
+        self.recording_thread = threading.Thread(target=self.record, daemon=True)
+        self.recording_thread.start()
+        return fps
+
+    def record(self):
+        while True:
+            frame = self.record_frames.get(timeout=0.1)
+            if frame is None:
+                if self.recorder_stopping:
+                    break
+                continue
+            # Paused frames and the watchdog's placeholders are not recorded
+            if self.paused or frame.placeholder:
+                continue
+            image = self.render(frame, self.telemetry) if self.render is not None else frame.image
+            self.writer.write(image)
+            self.written += 1
+
+    def stop_recording(self):
+        if self.writer is None:
+            return
+        # Stop new frames, let the recorder write out what is queued, then close the files
+        self.bus.unsubscribe(self.record_frames)
+        self.recorder_stopping = True
+        self.recording_thread.join()
+        print(f"Camera {self.index}: recorded {self.written} frames ({self.record_frames.dropped} dropped)")
+        self.writer.release()
+        self.writer = None
+        self.render = None
+        self.record_frames = None
+        if self.telemetry is not None:
+            self.telemetry.close()
+            self.telemetry = None
+
+    def stop(self):
+        self.stop_recording()
+        self.watchdog.stop()
+        self.grabber.stop()
+        self.grabber.cap.release()
+
+
+class Composite:
+    # Tiles are resized straight into their ROI of a persistent canvas, and only
+    # when that camera delivered a new frame, so there is no per-camera full-frame copy
+    def __init__(self, count, layout="tiled"):
+        self.count = count
+        self.layout = layout
+        self.canvas = None
+        self.rects = []
+        self.insets = {}
+
+    def resize(self, width, height):
+        if self.canvas is not None and self.canvas.shape[:2] == (height, width):
+            return
+        self.canvas = np.zeros((height, width, 3), np.uint8)
+        self.rects = self.pip_rects(width, height) if self.layout == "pip" else self.tiled_rects(width, height)
+        self.insets = {}
+
+    def tiled_rects(self, width, height):
+        cols = math.ceil(math.sqrt(self.count))
+        rows = math.ceil(self.count / cols)
+        tile_width, tile_height = width // cols, height // rows
+        return [((i % cols) * tile_width, (i // cols) * tile_height, tile_width, tile_height)
+                for i in range(self.count)]
+
+    def pip_rects(self, width, height):
+        # Camera 0 fills the view, the others are stacked as insets in the bottom left corner
+        inset_width, inset_height, margin = width // 4, height // 4, 10
+        rects = [(0, 0, width, height)]
+        for i in range(1, self.count):
+            y = max(0, height - i * (inset_height + margin))
+            rects.append((margin, y, inset_width, inset_height))
+        return rects
+
+    def update(self, index, image):
+        x, y, width, height = self.rects[index]
+        interpolation = scaling_plan((image.shape[1], image.shape[0]), (width, height)).interpolation
+        if self.layout == "pip" and index > 0:
+            inset = self.insets.get(index)
+            if inset is None:
+                inset = self.insets[index] = np.empty((height, width, 3), np.uint8)
+            cv2.resize(image, (width, height), dst=inset, interpolation=interpolation)
+            self.canvas[y:y + height, x:x + width] = inset
+            return
+        cv2.resize(image, (width, height), dst=self.canvas[y:y + height, x:x + width], interpolation=interpolation)
+        if self.layout == "pip":
+            # The main view was drawn over the insets, so put them back (they are small)
+            for inset_index, inset in self.insets.items():
+                ix, iy, inset_width, inset_height = self.rects[inset_index]
+                self.canvas[iy:iy + inset_height, ix:ix + inset_width] = inset
@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+import cv2
+
+# Overlay colours are defined once, as RGB, and looked up in the colour order of the
+# frame they are drawn on. The pipeline stays in the camera's BGR order end to end
+# and only the display surface converts to RGB.
+OVERLAY_COLOURS_RGB = {
+    "radar_needle": (255, 0, 0),
+    "radar_frame": (255, 255, 255),
+    "roll_text": (255, 0, 0),
+    "date_text": (255, 255, 255),
+    "session_text": (0, 255, 0),
+    "timer_text": (255, 0, 0),
+}
+
+# Angular resolution of the radar needle lookup table
+NEEDLE_STEP_DEGREES = 0.5
+
+
+def overlay_colours(order="BGR"):
+    if order == "RGB":
+        return dict(OVERLAY_COLOURS_RGB)
+    return {name: colour[::-1] for name, colour in OVERLAY_COLOURS_RGB.items()}
+
+
+class AlphaSprite:
+    # A colour layer plus alpha mask, blended into a frame at a position so only the
+    # pixels it covers are touched. Nothing is written after construction, so one
+    # sprite can be blended from the preview and recorder threads at once.
+    def __init__(self, colour_layer, alpha):
+        alpha = np.broadcast_to(alpha[:, :, None], colour_layer.shape)
+        self.shape = colour_layer.shape
+        self.inverse = 255 - alpha
+        # Hard-edged drawing gives a 0/255 alpha, which blends exactly as mask-and-or
+        self.binary = bool(np.isin(alpha, (0, 255)).all())
+        if self.binary:
+            self.colour = cv2.bitwise_and(colour_layer, np.ascontiguousarray(alpha))
+        else:
+            self.colour = cv2.multiply(colour_layer, np.ascontiguousarray(alpha), scale=1 / 255)
+
+    def blend(self, frame, x=0, y=0):
+        height, width = self.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, frame.shape[1]), min(y + height, frame.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        roi = frame[y0:y1, x0:x1]
+        part = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        if self.binary:
+            cv2.bitwise_and(roi, self.inverse[part], dst=roi)
+            cv2.bitwise_or(roi, self.colour[part], dst=roi)
+        else:
+            # Premultiplied colour over the background scaled by the inverse alpha
+            cv2.multiply(roi, self.inverse[part], dst=roi, scale=1 / 255)
+            cv2.add(roi, self.colour[part], dst=roi)
+
+
+class RadarSprite(AlphaSprite):
+    # The static part of the radar (ring and crosshair) rendered once for a frame size,
+    # with the same primitives draw_radar() used per frame, and blended over the radar's
+    # bounding box only. The needle end points for every `step` degrees are tabulated
+    # too, so per frame the needle is a lookup and one cv2.line.
+    # By default it sits in the top right corner as draw_radar() placed it; a layout
+    # can pass its own center and radius.
+    def __init__(self, width, height, order="BGR", step=NEEDLE_STEP_DEGREES, center=None, radius=None):
+        colour = overlay_colours(order)["radar_frame"]
+        self.radius = radius if radius is not None else min(width, height) // 8
+        self.center = center if center is not None else (width - self.radius - 20, self.radius + 20)
+        angles = np.radians(np.arange(0, 360, step))
+        ends_x = (self.center[0] + self.radius * np.cos(angles)).astype(int)
+        ends_y = (self.center[1] - self.radius * np.sin(angles)).astype(int)
+        self.needle_ends = list(zip(ends_x.tolist(), ends_y.tolist()))
+        self.needle_scale = len(self.needle_ends) / (2 * np.pi)
+        # The ring is 2 px thick, so it reaches one pixel past the radius
+        reach = self.radius + 2
+        self.origin = (self.center[0] - reach, self.center[1] - reach)
+        center = (reach, reach)
+        radius = self.radius
+        colour_layer = np.zeros((2 * reach + 1, 2 * reach + 1, 3), np.uint8)
+        alpha = np.zeros((2 * reach + 1, 2 * reach + 1), np.uint8)
+        for layer, value in ((colour_layer, colour), (alpha, 255)):
+            cv2.circle(layer, center, radius, value, 2)
+            cv2.line(layer, (center[0], center[1] - radius), (center[0], center[1] + radius), value, 1)
+            cv2.line(layer, (center[0] - radius, center[1]), (center[0] + radius, center[1]), value, 1)
+        super().__init__(colour_layer, alpha)
+
+    def needle_end(self, angle_rad):
+        return self.needle_ends[round(angle_rad * self.needle_scale) % len(self.needle_ends)]
+
+    def blend(self, frame):
+        super().blend(frame, *self.origin)
+
+
+class TextSprite(AlphaSprite):
+    # One string rasterised with cv2.putText into an alpha mask. draw() takes the same
+    # bottom-left origin as putText.
+    def __init__(self, text, font, scale, colour, thickness=1, line_type=cv2.LINE_AA):
+        (width, height), baseline = cv2.getTextSize(text, font, scale, thickness)
+        pad = thickness + 2
+        alpha = np.zeros((height + baseline + 2 * pad, width + 2 * pad), np.uint8)
+        cv2.putText(alpha, text, (pad, pad + height), font, scale, 255, thickness, line_type)
+        colour_layer = np.empty(alpha.shape + (3,), np.uint8)
+        colour_layer[:] = colour
+        super().__init__(colour_layer, alpha)
+        self.size = (width, height)
+        self.baseline = baseline
+        self.offset = (-pad, -pad - height)
+
+    def draw(self, frame, org):
+        self.blend(frame, org[0] + self.offset[0], org[1] + self.offset[1])
+
+
+class TextCache:
+    # Rendered overlay strings, keyed by text, font, scale, colour, thickness and line
+    # type. The overlay strings change at most once a second, so nearly every frame is
+    # a blit of cached bitmaps instead of an anti-aliased putText. Least recently used
+    # strings are evicted once maxsize is reached.
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text, font, scale, colour, thickness=1, line_type=cv2.LINE_AA):
+        key = (text, font, scale, tuple(colour), thickness, line_type)
+        with self.lock:
+            sprite = self.sprites.get(key)
+            if sprite is not None:
+                self.sprites.move_to_end(key)
+                self.hits += 1
+                return sprite
+            self.misses += 1
+        sprite = TextSprite(text, font, scale, colour, thickness, line_type)
+        with self.lock:
+            self.sprites[key] = sprite
+            while len(self.sprites) > self.maxsize:
+                self.sprites.popitem(last=False)
+                self.evictions += 1
+        return sprite
+
+    def put_text(self, frame, text, org, font, scale, colour, thickness=1, line_type=cv2.LINE_AA):
+        # Drop-in for cv2.putText, returns the sprite so callers can reuse its size
+        sprite = self.get(text, font, scale, colour, thickness, line_type)
+        sprite.draw(frame, org)
+        return sprite
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return (f"text cache {len(self.sprites)} strings, {rate:.1f}% hit rate "
+                f"({self.hits} hits, {self.misses} misses, {self.evictions} evicted)")
+
+
+@lru_cache(maxsize=64)
+def text_size(text, font, scale, thickness=1):
+    # cv2.getTextSize for strings that are laid out every frame
+    return cv2.getTextSize(text, font, scale, thickness)
+
+
+@lru_cache(maxsize=8)
+def radar_sprite(width, height, order="BGR", step=NEEDLE_STEP_DEGREES, center=None, radius=None):
+    # Keyed by frame size: the preview, recorder and stills passes share one sprite and
+    # needle table per size, and a new window size builds a new one
+    return RadarSprite(width, height, order, step, center, radius)
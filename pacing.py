@@ -0,0 +1,62 @@
+import time
+
+
+class TkFramePacer:
+    # Runs a Tk preview callback once per frame interval instead of on a fixed
+    # after() delay. The callback returns True when it rendered a new frame. After
+    # a render the next tick is scheduled shortly before the following frame is due,
+    # minus the time the tick itself took; when no frame has arrived yet it polls
+    # briefly instead of waiting a whole interval.
+    def __init__(self, widget, callback, fps, refresh_rate=60.0, early=0.1):
+        self.widget = widget
+        self.callback = callback
+        self.refresh_rate = refresh_rate
+        self.early = early
+        self.set_rate(fps)
+        self.last_render = None
+        self.frames = 0
+        self.missed = 0
+        self.overruns = 0
+        self.polls = 0
+        self.after_id = None
+
+    def set_rate(self, fps):
+        # Never faster than the display can show
+        self.interval = 1.0 / min(fps or 30.0, self.refresh_rate)
+        self.poll_interval = max(0.002, self.interval / 8)
+
+    def start(self):
+        self.after_id = self.widget.after(0, self.tick)
+        return self
+
+    def tick(self):
+        start = time.monotonic()
+        rendered = self.callback()
+        end = time.monotonic()
+        if rendered:
+            if self.last_render is not None and end - self.last_render > 1.5 * self.interval:
+                self.missed += round((end - self.last_render) / self.interval) - 1
+            if end - start > self.interval:
+                self.overruns += 1
+            self.last_render = end
+            self.frames += 1
+            delay = self.interval * (1 - self.early) - (end - start)
+        else:
+            self.polls += 1
+            delay = self.poll_interval
+        self.after_id = self.widget.after(max(1, int(delay * 1000)), self.tick)
+
+    def stop(self):
+        if self.after_id is not None:
+            self.widget.after_cancel(self.after_id)
+            self.after_id = None
+
+    def resume(self):
+        # Restarts after stop() without counting the gap as missed deadlines
+        if self.after_id is None:
+            self.last_render = None
+            self.start()
+
+    def summary(self):
+        return (f"{self.frames} frames paced at {1 / self.interval:.1f} fps, {self.missed} missed deadlines, "
+                f"{self.overruns} ticks over budget, {self.polls} empty polls")
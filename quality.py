@@ -0,0 +1,69 @@
+import time
+from collections import deque
+
+# Ordered from best to cheapest. The preview is degraded first, then overlay
+# detail, and the frame rate last because it also thins out the recording.
+QUALITY_LEVELS = [
+    {"preview_scale": 1.0, "overlay": "full", "max_fps": None},
+    {"preview_scale": 0.75, "overlay": "full", "max_fps": None},
+    {"preview_scale": 0.5, "overlay": "full", "max_fps": None},
+    {"preview_scale": 0.5, "overlay": "reduced", "max_fps": None},
+    {"preview_scale": 0.5, "overlay": "reduced", "max_fps": 15},
+]
+
+
+# Used instead of the current level while low-power mode is on and nothing is recorded
+LOW_POWER_PREVIEW = {"preview_scale": 0.5, "overlay": "reduced", "max_fps": 10}
+
+
+def describe_level(settings):
+    fps = f", {settings['max_fps']} fps" if settings["max_fps"] else ""
+    return f"preview {int(settings['preview_scale'] * 100)}%, {settings['overlay']} overlay{fps}"
+
+
+class QualityController:
+    # Compares the average tick time against the frame budget and steps the quality
+    # down or back up. The gap between the two thresholds plus the hold time keeps
+    # it from oscillating.
+    def __init__(self, budget, levels=QUALITY_LEVELS, window=30, degrade_at=0.9, restore_at=0.5, hold=2.0):
+        self.budget = budget
+        self.levels = levels
+        self.degrade_at = degrade_at
+        self.restore_at = restore_at
+        self.hold = hold
+        self.samples = deque(maxlen=window)
+        self.level = 0
+        self.last_change = time.monotonic()
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def max_level(self, recording):
+        # While recording, levels that would thin out the recorded frames are off limits
+        if not recording:
+            return len(self.levels) - 1
+        allowed = [i for i, settings in enumerate(self.levels) if not settings["max_fps"]]
+        return allowed[-1]
+
+    def record(self, seconds, recording=False):
+        self.samples.append(seconds)
+        limit = self.max_level(recording)
+        if self.level > limit:
+            self.change(limit, "recording started")
+            return
+        now = time.monotonic()
+        if len(self.samples) < self.samples.maxlen or now - self.last_change < self.hold:
+            return
+        average = sum(self.samples) / len(self.samples)
+        reason = f"tick {average * 1000:.1f} ms of {self.budget * 1000:.1f} ms budget"
+        if average > self.budget * self.degrade_at and self.level < limit:
+            self.change(self.level + 1, reason)
+        elif average < self.budget * self.restore_at and self.level > 0:
+            self.change(self.level - 1, reason)
+
+    def change(self, level, reason):
+        print(f"Quality: level {self.level} -> {level} ({describe_level(self.levels[level])}), {reason}")
+        self.level = level
+        self.samples.clear()
+        self.last_change = time.monotonic()
@@ -0,0 +1,72 @@
+import csv
+import threading
+import time
+
+TELEMETRY_FIELDS = ["frame", "seq", "timestamp", "wall_time", "roll", "angle", "session", "timer"]
+
+
+class RollReader:
+    # Polls the Arduino on its own thread so serial I/O never blocks the UI loop
+    def __init__(self, serial_conn, initial="0"):
+        self.serial_conn = serial_conn
+        self.roll = initial
+        self.timestamp = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while self.running:
+            try:
+                line = self.serial_conn.readline().decode('utf-8', errors='replace').strip()
+            except Exception as e:
+                if self.running:
+                    print(f"Serial read failed: {e}")
+                    time.sleep(0.5)
+                continue
+            if not line:
+                continue
+            print(f"Serial line read: {line}")
+            if line.startswith("roll ="):
+                parts = line.split(',')
+                self.roll = parts[0].split('=')[1].strip()
+                self.timestamp = time.monotonic()
+
+    def latest(self):
+        return self.roll
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+
+class TelemetryLog:
+    # Sidecar for a clean recording: one CSV row per written frame with what the overlay
+    # needs, so it can be burnt in afterwards by export.py. The angle is the smoothed
+    # radar angle as shown live, left empty where only the raw roll is known.
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(TELEMETRY_FIELDS)
+        self.frames = 0
+
+    def write(self, frame, angle=None, timer="", session=""):
+        self.writer.writerow([self.frames, frame.seq, f"{frame.timestamp:.6f}", frame.wall_time.isoformat(),
+                              frame.roll, "" if angle is None else f"{angle:.6f}", session, timer or ""])
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+
+def read_telemetry(path):
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))